@@ -1,16 +1,20 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash
 import os
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
 from dotenv import load_dotenv
 import datetime
 from bson import json_util, ObjectId
+from bson.errors import InvalidId
 import json
+import base64
 import re
+import time
 from functools import wraps
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -18,10 +22,28 @@ from flask_caching import Cache
 import boto3
 from botocore.exceptions import NoCredentialsError, ClientError
 import uuid
+from vote_guard import VoteGuard
+import instrumentation
+from query_stats import QueryObserver
+from jobs import JobRunner, delete_in_batches
+import ballot_io
+import vote_archive
+import close_out
+import publish
+import changes
+import ballot
+import vote_keys
+import rollups
+import vote_tally
+import static_files
+import compression
+import search
+import passwords
+import resilience
 
 load_dotenv()
 
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)  # static_files.py serves the frontend build
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = datetime.timedelta(hours=24)
@@ -31,7 +53,7 @@ jwt = JWTManager(app)
 
 # Configure CORS with specific origins
 allowed_origins = os.getenv('ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
-CORS(app, origins=allowed_origins, methods=['GET', 'POST', 'PUT', 'DELETE'])
+CORS(app, origins=allowed_origins, methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
 
 # Configure caching
 config = {
@@ -47,28 +69,50 @@ S3_BUCKET = os.getenv('S3_BUCKET_NAME')
 S3_PATH = os.getenv('S3_BUCKET_PATH')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 S3_BUCKET_URL = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com"
+# Public base URL for published results (a CDN in front of the bucket, if any)
+PUBLISHED_BASE_URL = (os.getenv('PUBLISHED_BASE_URL') or S3_BUCKET_URL).rstrip('/')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
 # Initialize S3 client
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-    region_name=AWS_REGION
-)
+def create_s3_client():
+    s3 = boto3.client(
+        's3',
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=AWS_REGION,
+        config=resilience.S3_CONFIG
+    )
+    # Timeouts and a circuit breaker, so a slow S3 cannot hold up workers
+    resilience.guard_s3(s3)
+    return s3
+
+s3_client = create_s3_client()
+
+# Request, cache and S3 instrumentation (exposed at /api/metrics)
+instrumentation.init_app(app, cache=cache, s3_client=s3_client)
+# MongoDB deadlines, circuit breakers and their 503s
+resilience.init_app(app)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
 
 # MongoDB connection with security
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
 ssl_enabled = os.getenv('MONGODB_SSL', 'false').lower() == 'true'
 
+# Query-shape statistics and slow-query log
+query_observer = QueryObserver(
+    slow_ms=float(os.getenv('SLOW_QUERY_MS', '100')),
+    explain_verbosity=os.getenv('SLOW_QUERY_EXPLAIN_VERBOSITY', 'queryPlanner')
+)
+
 # Build connection kwargs dynamically
 connection_kwargs = {
     'authSource': os.getenv('MONGODB_AUTH_SOURCE', 'admin'),
     'connectTimeoutMS': 5000,
-    'serverSelectionTimeoutMS': 5000
+    'serverSelectionTimeoutMS': 5000,
+    'event_listeners': [instrumentation.MongoCommandListener(), query_observer, resilience.MongoSuccessListener()]
 }
 
 # Only add SSL/TLS options if SSL is enabled
@@ -78,14 +122,42 @@ if ssl_enabled:
         'tlsAllowInvalidCertificates': False
     })
 
-client = MongoClient(MONGODB_URI, **connection_kwargs)
-db = client['napling_choice_awards']
-
-# Collections
-categories = db['categories']
-nominees = db['nominees']
-votes = db['votes']
-admin_users = db['admin_users']
+def connect_database():
+    """Create the MongoDB client and the collection handles used below"""
+    global client, db, categories, nominees, votes, admin_users, vote_flags, jobs
+    global results_snapshots, vote_rollups, vote_counters
+    client = MongoClient(MONGODB_URI, **connection_kwargs)
+    query_observer.bind(client)
+    db = client['napling_choice_awards']
+
+    # Collections
+    categories = db['categories']
+    nominees = db['nominees']
+    votes = db['votes']
+    admin_users = db['admin_users']
+    vote_flags = db['vote_flags']
+    jobs = db['jobs']
+    results_snapshots = db['results_snapshots']
+    vote_rollups = db['vote_rollups']
+    vote_counters = db['vote_counters']
+
+connect_database()
+
+# Documents that are soft-deleted and waiting for a background job to remove them
+NOT_DELETED = {'deleted': {'$ne': True}}
+
+# Key for the hashed voter identity stored on votes (see vote_keys.py)
+VOTER_HASH_SECRET = vote_keys.hash_secret()
+
+# Streaming vote-abuse detection (runs off the request path)
+vote_guard = VoteGuard(
+    vote_flags,
+    prefix_limit=int(os.getenv('VOTE_GUARD_PREFIX_LIMIT', '30')),
+    prefix_window=int(os.getenv('VOTE_GUARD_PREFIX_WINDOW', '300')),
+    surge_factor=float(os.getenv('VOTE_GUARD_SURGE_FACTOR', '5')),
+    surge_min_votes=int(os.getenv('VOTE_GUARD_SURGE_MIN_VOTES', '50'))
+)
+VOTE_GUARD_ENABLED = os.getenv('VOTE_GUARD_ENABLED', 'true').lower() == 'true'
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -125,6 +197,12 @@ def delete_from_s3(filename):
         return False
 
 def get_client_ip():
+    """Get the real client IP address; the rate limiter and the handler share one parse per request"""
+    if 'client_ip' not in g:
+        g.client_ip = parse_client_ip()
+    return g.client_ip
+
+def parse_client_ip():
     """Get the real client IP address, accounting for proxies"""
     # Check for X-Forwarded-For header (set by nginx/proxy)
     if request.headers.get('X-Forwarded-For'):
@@ -203,6 +281,96 @@ def validate_nominee_data(data):
 
     return errors
 
+# Background jobs (cascade deletes, ...)
+job_runner = JobRunner(
+    jobs,
+    max_attempts=int(os.getenv('JOB_MAX_ATTEMPTS', '5')),
+    retry_delay=float(os.getenv('JOB_RETRY_DELAY_SECONDS', '30'))
+)
+DELETE_BATCH_SIZE = int(os.getenv('DELETE_BATCH_SIZE', '1000'))
+DELETE_BATCH_PAUSE = float(os.getenv('DELETE_BATCH_PAUSE_MS', '100')) / 1000
+
+def cascade_delete_category(job, runner):
+    """Remove a soft-deleted category's votes and nominees in throttled batches"""
+    category_id = job['params']['category_id']
+    result = {}
+    for name, collection, match in (('votes', votes, vote_keys.id_match(category_id)),
+                                    ('rollups', vote_rollups, ObjectId(category_id)),
+                                    ('counters', vote_counters, ObjectId(category_id)),
+                                    ('nominees', nominees, category_id)):
+        result[f'{name}_deleted'] = delete_in_batches(
+            collection,
+            {'category_id': match},
+            DELETE_BATCH_SIZE,
+            DELETE_BATCH_PAUSE,
+            on_batch=lambda count, name=name: runner.progress(job, inc={f'{name}_deleted': count})
+        )
+    categories.delete_one({'_id': ObjectId(category_id), 'deleted': True})
+    return result
+
+job_runner.register('delete_category', cascade_delete_category)
+
+def run_close_out(job, runner):
+    """Freeze a category's results and move its votes to an archive"""
+    category = categories.find_one({'id': job['params']['category_id'], **NOT_DELETED})
+    if not category:
+        raise ValueError('Category not found')
+    summary = close_out.close_out_category(
+        db,
+        category,
+        archive=job['params'].get('archive', 's3'),
+        delete_batch_size=DELETE_BATCH_SIZE,
+        delete_pause=DELETE_BATCH_PAUSE,
+        on_progress=lambda inc=None, **fields: runner.progress(job, inc=inc, **fields),
+        archive_dir=os.getenv('ARCHIVE_DIR', 'archives'),
+        s3_client=s3_client,
+        s3_bucket=S3_BUCKET,
+        s3_prefix=S3_PATH
+    )
+    cache.clear()  # Results now come from the snapshot
+    # Republish so the static results match the frozen snapshot
+    job_runner.enqueue('publish', {'category_id': category['id']})
+    return summary
+
+job_runner.register('close_out', run_close_out)
+
+def run_publish(job, runner):
+    """Upload a locked category's results and ballot as static JSON"""
+    category = categories.find_one({'id': job['params']['category_id'], **NOT_DELETED})
+    if not category:
+        raise ValueError('Category not found')
+    if not category.get('voting_locked'):
+        return {'skipped': 'Voting is not locked'}
+    published = publish.publish_category(db, category, s3_client, S3_BUCKET, S3_PATH, PUBLISHED_BASE_URL)
+    if published is None:
+        return {'skipped': 'Voting was unlocked while publishing'}
+    cache.clear()  # Categories now carry the published URLs
+    return published
+
+job_runner.register('publish', run_publish)
+
+def run_recount_votes(job, runner):
+    """Rebuild a category's sharded counters from its votes after a failed counter write"""
+    category = categories.find_one({'id': job['params']['category_id'], **NOT_DELETED}, {'counter_shards': 1})
+    if not category:
+        raise ValueError('Category not found')
+    shards = category.get('counter_shards') or vote_tally.DEFAULT_SHARDS
+    counted = vote_tally.enable(db, job['params']['category_id'], shards)
+    cache.clear()  # Results now come from the corrected counters
+    return {'votes_counted': counted}
+
+job_runner.register('recount_votes', run_recount_votes)
+
+def start_background_threads():
+    if VOTE_GUARD_ENABLED:
+        vote_guard.start()
+    job_runner.start()
+
+# Under gunicorn --preload the master only imports the app; each worker starts
+# its threads after the fork, in reinit_after_fork()
+if os.getenv('NAPLING_PRELOAD') != '1':
+    start_background_threads()
+
 # Initialize default admin users
 def initialize_admin_users():
     """Create default admin users if they don't exist"""
@@ -214,7 +382,7 @@ def initialize_admin_users():
     for admin_data in default_admins:
         existing_admin = admin_users.find_one({'username': admin_data['username']})
         if not existing_admin:
-            hashed_password = generate_password_hash(admin_data['password'])
+            hashed_password = generate_password_hash(admin_data['password'], passwords.HASH_METHOD)
             admin_user = {
                 'username': admin_data['username'],
                 'password': hashed_password,
@@ -242,8 +410,18 @@ def login():
     # Find admin user
     admin_user = admin_users.find_one({'username': username})
 
-    if not admin_user or not check_password_hash(admin_user['password'], password):
+    if not admin_user:
+        return jsonify({'error': 'Invalid credentials'}), 401
+    try:
+        matches, new_hash = passwords.verify(admin_user['password'], password)
+    except passwords.PasswordHashBusy:
+        return jsonify({'error': 'Too many login attempts in progress, try again shortly'}), 503, {'Retry-After': '1'}
+    if not matches:
         return jsonify({'error': 'Invalid credentials'}), 401
+    if new_hash:
+        # Hash parameters changed since this password was stored
+        admin_users.update_one({'_id': admin_user['_id'], 'password': admin_user['password']},
+                               {'$set': {'password': new_hash}})
 
     # Create access token
     access_token = create_access_token(identity=username)
@@ -274,11 +452,16 @@ def change_password():
     # Get current user
     admin_user = admin_users.find_one({'username': current_user})
 
-    if not admin_user or not check_password_hash(admin_user['password'], current_password):
+    if not admin_user:
         return jsonify({'error': 'Current password is incorrect'}), 401
-
-    # Update password
-    hashed_new_password = generate_password_hash(new_password)
+    try:
+        matches, _ = passwords.verify(admin_user['password'], current_password)
+        if not matches:
+            return jsonify({'error': 'Current password is incorrect'}), 401
+        # Update password
+        hashed_new_password = passwords.hash_password(new_password)
+    except passwords.PasswordHashBusy:
+        return jsonify({'error': 'Password hashing is busy, try again shortly'}), 503, {'Retry-After': '1'}
     admin_users.update_one(
         {'username': current_user},
         {'$set': {
@@ -291,6 +474,7 @@ def change_password():
 
 @app.route('/api/auth/verify', methods=['GET'])
 @jwt_required()
+@resilience.without_mongo
 def verify_token():
     """Verify JWT token is valid"""
     current_user = get_jwt_identity()
@@ -299,6 +483,7 @@ def verify_token():
 @app.route('/api/upload', methods=['POST'])
 @limiter.limit("10/minute")
 @jwt_required()
+@resilience.without_mongo
 def upload_file():
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -321,15 +506,17 @@ def upload_file():
                 'filename': key,
                 'url': file_url
             }), 200
+        except resilience.CircuitOpen:
+            return resilience.unavailable('Image storage')
         except Exception as e:
             return jsonify({'error': f'Upload failed: {str(e)}'}), 500
     else:
         return jsonify({'error': 'File type not allowed'}), 400
 
 @app.route('/api/categories', methods=['GET'])
-@cache.cached(timeout=600)  # Cache for 10 minutes
+@compression.cached_json(cache, timeout=600)  # Cache for 10 minutes
 def get_categories():
-    cats = list(categories.find({}, {'_id': 0}))
+    cats = list(categories.find(NOT_DELETED, {'_id': 0}))
     # Convert ObjectId to string id for each category
     # for cat in cats:
     #     cat['id'] = str(cat.pop('_id', ''))
@@ -346,38 +533,159 @@ def create_category():
     if errors:
         return jsonify({'error': 'Validation failed', 'details': errors}), 400
 
+    # The id is set before the insert, so no reader ever sees the category without it
+    category_id = ObjectId()
     category = {
+        '_id': category_id,
+        'id': str(category_id),
         'name': sanitize_input(data['name']),
         'description': sanitize_input(data.get('description', '')),
         'voting_locked': data.get('voting_locked', False),
-        'created_at': datetime.datetime.now(datetime.UTC)
+        'tally': 'sharded',
+        'counter_shards': vote_tally.DEFAULT_SHARDS,
+        'created_at': datetime.datetime.now(datetime.UTC),
+        'version': changes.next_version(db)
     }
-    result = categories.insert_one(category)
-    category['id'] = str(result.inserted_id)
-    # Update the document to include the id field
-    categories.update_one(
-        {'_id': result.inserted_id},
-        {'$set': {'id': str(result.inserted_id)}}
-    )
+    try:
+        categories.insert_one(category)
+    except DuplicateKeyError:
+        return {'error': 'A category with this name already exists'}, 409
 
     # Clear relevant caches
     cache.clear()  # Clear all cache when categories change
 
     return json.loads(json_util.dumps(category)), 201
 
+# Keyset pagination for GET /api/nominees
+NOMINEE_PAGE_SIZE = 100
+NOMINEE_PAGE_MAX = 500
+NOMINEE_STREAM_BATCH_SIZE = 500
+# Streamed bodies are flushed in chunks of about this many bytes
+STREAM_CHUNK_BYTES = 64 * 1024
+
+def encode_cursor(object_id):
+    """Opaque page cursor for the last _id of a page"""
+    return base64.urlsafe_b64encode(object_id.binary).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError, InvalidId):
+        return None
+
+def iter_json_array(cursor):
+    """Write a cursor out as a JSON array, one chunk at a time"""
+    chunk = ['[']
+    size = 1
+    for i, document in enumerate(cursor):
+        part = (',' if i else '') + app.json.dumps(document)
+        chunk.append(part)
+        size += len(part)
+        if size >= STREAM_CHUNK_BYTES:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    chunk.append(']')
+    yield ''.join(chunk)
+
 @app.route('/api/nominees', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)  # Cache for 5 minutes
+@compression.cached_json(cache, timeout=300, query_string=True)  # Cache for 5 minutes
 def get_nominees():
+    """Nominees, optionally one keyset page at a time or streamed as a JSON array"""
     category_id = request.args.get('category_id')
-    query = {}
+    query = dict(NOT_DELETED)
     if category_id:
         query['category_id'] = category_id
 
-    prods = list(nominees.find(query, {'_id': 0}))
-    # Convert ObjectId to string id for each nominee
-    # for prod in prods:
-    #     prod['id'] = str(prod.pop('_id', ''))
-    return prods
+    if request.args.get('stream') == '1':
+        if 'limit' in request.args or 'after' in request.args:
+            return {'error': 'stream cannot be combined with limit or after'}, 400
+        # _id order is served by an index (with category_id: the compound one), so nothing is sorted in memory
+        cursor = nominees.find(query, {'_id': 0}, batch_size=NOMINEE_STREAM_BATCH_SIZE).sort('_id', 1)
+        # Like the exports, the dump runs as long as the download does
+        resilience.lift_mongo_deadline()
+        return Response(stream_with_context(iter_json_array(cursor)), mimetype='application/json')
+
+    if 'limit' not in request.args and 'after' not in request.args:
+        return list(nominees.find(query, {'_id': 0}))
+
+    try:
+        limit = int(request.args.get('limit', NOMINEE_PAGE_SIZE))
+    except ValueError:
+        return {'error': 'limit must be an integer'}, 400
+    if not 1 <= limit <= NOMINEE_PAGE_MAX:
+        return {'error': f'limit must be between 1 and {NOMINEE_PAGE_MAX}'}, 400
+    if request.args.get('after'):
+        after = decode_cursor(request.args['after'])
+        if after is None:
+            return {'error': 'Invalid cursor'}, 400
+        query['_id'] = {'$gt': after}
+
+    # One extra document tells whether another page follows
+    page = list(nominees.find(query).sort('_id', 1).limit(limit + 1))
+    next_cursor = encode_cursor(page[limit - 1]['_id']) if len(page) > limit else None
+    for nominee in page:
+        del nominee['_id']
+    return {'nominees': page[:limit], 'next_cursor': next_cursor}
+
+# Materialized public ballot; other workers' edits are noticed through the change version
+BALLOT_REVALIDATE_SECONDS = float(os.getenv('BALLOT_REVALIDATE_SECONDS', '5'))
+
+def current_ballot():
+    """Pre-rendered ballot from the cache, rebuilt when admin data changes"""
+    cached = cache.get('ballot')
+    now = time.monotonic()
+    if cached is not None and now - cached['checked_at'] < BALLOT_REVALIDATE_SECONDS:
+        return cached
+
+    def revalidate():
+        if cached is not None and cached.get('settled') and changes.current_version(db) == cached['version']:
+            return cached
+        built = ballot.build(db, NOT_DELETED)
+        entry = compression.encode(built['body'], '/api/ballot')
+        entry['version'] = built['version']
+        entry['settled'] = built['settled']
+        return entry
+
+    # While MongoDB is down the last ballot keeps being served
+    entry, stale = resilience.outage_fallback(revalidate, cached)
+    if not stale:
+        entry['checked_at'] = now
+        # cache.clear() after any local mutation drops it as well
+        cache.set('ballot', entry, timeout=0)
+    return entry
+
+@app.route('/api/ballot', methods=['GET'])
+@resilience.handles_outage
+def get_ballot():
+    """All categories with their nominees, for the voting page"""
+    return compression.respond(current_ballot(), '/api/ballot', {'Cache-Control': 'no-cache'})
+
+nominee_search = search.NomineeSearch(db, NOT_DELETED)
+SEARCH_PAGE_MAX = 100
+
+@app.route('/api/nominees/search', methods=['GET'])
+@limiter.limit("120/minute")  # Search-as-you-type
+@resilience.handles_outage
+def search_nominees():
+    """Ranked nominee matches for ?q=, optionally within one category"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return {'error': 'q is required'}, 400
+    try:
+        limit = int(request.args.get('limit', 20))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return {'error': 'limit and offset must be integers'}, 400
+    if not 1 <= limit <= SEARCH_PAGE_MAX or offset < 0:
+        return {'error': f'limit must be between 1 and {SEARCH_PAGE_MAX} and offset not negative'}, 400
+
+    index, _ = resilience.outage_fallback(nominee_search.current, nominee_search.index)
+    total, page = index.search(query, request.args.get('category_id'), offset, limit)
+    return {
+        'results': page,
+        'total': total,
+        'next_offset': offset + limit if offset + limit < total else None
+    }
 
 @app.route('/api/nominees', methods=['POST'])
 @limiter.limit("20/minute")
@@ -390,21 +698,20 @@ def create_nominee():
     if errors:
         return jsonify({'error': 'Validation failed', 'details': errors}), 400
 
+    # The id is set before the insert, so no reader ever sees the nominee without it
+    nominee_id = ObjectId()
     nominee = {
+        '_id': nominee_id,
+        'id': str(nominee_id),
         'name': sanitize_input(data['name']),
         'description': sanitize_input(data.get('description', '')),
         'category_id': data['category_id'],
         'image_url': data.get('image_url', ''),
         'youtube_url': data.get('youtube_url', ''),
-        'created_at': datetime.datetime.now(datetime.UTC)
+        'created_at': datetime.datetime.now(datetime.UTC),
+        'version': changes.next_version(db)
     }
-    result = nominees.insert_one(nominee)
-    nominee['id'] = str(result.inserted_id)
-    # Update the document to include the id field
-    nominees.update_one(
-        {'_id': result.inserted_id},
-        {'$set': {'id': str(result.inserted_id)}}
-    )
+    nominees.insert_one(nominee)
 
     # Clear relevant caches
     cache.clear()  # Clear all cache when nominees change
@@ -416,34 +723,47 @@ def update_category(category_id):
     try:
         data = request.get_json()
 
-        # Check if category exists
-        category = categories.find_one({'_id': ObjectId(category_id)})
-        if not category:
-            return {'error': 'Category not found'}, 404
-
-        # Update category
+        # Only the fields sent are changed, in one round-trip
+        if 'counter_shards' in data and (not isinstance(data['counter_shards'], int)
+                                         or not 1 <= data['counter_shards'] <= 64):
+            return {'error': 'counter_shards must be between 1 and 64'}, 400
         update_data = {
-            'name': data.get('name', category['name']),
-            'description': data.get('description', category['description']),
-            'voting_locked': data.get('voting_locked', category.get('voting_locked', False)),
-            'updated_at': datetime.datetime.now(datetime.UTC)
+            key: data[key] for key in ('name', 'description', 'voting_locked', 'counter_shards') if key in data
         }
-
-        result = categories.update_one(
-            {'_id': ObjectId(category_id)},
-            {'$set': update_data}
+        update_data['updated_at'] = datetime.datetime.now(datetime.UTC)
+        update_data['version'] = changes.next_version(db)
+
+        query = {'_id': ObjectId(category_id), **NOT_DELETED}
+        update = {'$set': update_data}
+        if data.get('voting_locked') is False:
+            query['results_frozen'] = {'$ne': True}
+            # Published results are stale once voting reopens
+            update['$unset'] = {'published': ''}
+
+        updated_category = categories.find_one_and_update(
+            query,
+            update,
+            projection={'_id': 0},
+            return_document=ReturnDocument.AFTER
         )
+        if not updated_category:
+            if categories.find_one({'_id': ObjectId(category_id), **NOT_DELETED}, {'_id': 1}):
+                return {'error': 'Results for this category are final'}, 409
+            return {'error': 'Category not found'}, 404
 
-        if result.modified_count > 0:
-            # Clear relevant caches
-            cache.clear()  # Clear all cache when categories change
+        if updated_category.get('voting_locked'):
+            # Publishing is content-addressed, so an unchanged category keeps its URLs
+            job_runner.enqueue('publish', {'category_id': category_id})
 
-            # Return updated category
-            updated_category = categories.find_one({'_id': ObjectId(category_id)}, {'_id': 0})
-            return json.loads(json_util.dumps(updated_category)), 200
-        else:
-            return {'error': 'No changes made to category'}, 400
+        # Clear relevant caches
+        cache.clear()  # Clear all cache when categories change
 
+        return json.loads(json_util.dumps(updated_category)), 200
+
+    except DuplicateKeyError:
+        return {'error': 'A category with this name already exists'}, 409
+    except resilience.MONGO_OUTAGE_ERRORS:
+        raise  # Answered with a 503 and counted by the MongoDB breaker
     except Exception as e:
         print(f"Error updating category {category_id}: {str(e)}")
         return {'error': 'Failed to update category'}, 500
@@ -454,36 +774,31 @@ def update_nominee(nominee_id):
     try:
         data = request.get_json()
 
-        # Check if nominee exists
-        nominee = nominees.find_one({'_id': ObjectId(nominee_id)})
-        if not nominee:
-            return {'error': 'Nominee not found'}, 404
-
-        # Update nominee
+        # Only the fields sent are changed, in one round-trip
         update_data = {
-            'name': data.get('name', nominee['name']),
-            'description': data.get('description', nominee['description']),
-            'category_id': data.get('category_id', nominee['category_id']),
-            'image_url': data.get('image_url', nominee.get('image_url', '')),
-            'youtube_url': data.get('youtube_url', nominee.get('youtube_url', '')),
-            'updated_at': datetime.datetime.now(datetime.UTC)
+            key: data[key]
+            for key in ('name', 'description', 'category_id', 'image_url', 'youtube_url')
+            if key in data
         }
+        update_data['updated_at'] = datetime.datetime.now(datetime.UTC)
+        update_data['version'] = changes.next_version(db)
 
-        result = nominees.update_one(
+        updated_nominee = nominees.find_one_and_update(
             {'_id': ObjectId(nominee_id)},
-            {'$set': update_data}
+            {'$set': update_data},
+            projection={'_id': 0},
+            return_document=ReturnDocument.AFTER
         )
+        if not updated_nominee:
+            return {'error': 'Nominee not found'}, 404
 
-        if result.modified_count > 0:
-            # Clear relevant caches
-            cache.clear()  # Clear all cache when nominees change
+        # Clear relevant caches
+        cache.clear()  # Clear all cache when nominees change
 
-            # Return updated nominee
-            updated_nominee = nominees.find_one({'_id': ObjectId(nominee_id)}, {'_id': 0})
-            return json.loads(json_util.dumps(updated_nominee)), 200
-        else:
-            return {'error': 'No changes made to nominee'}, 400
+        return json.loads(json_util.dumps(updated_nominee)), 200
 
+    except resilience.MONGO_OUTAGE_ERRORS:
+        raise  # Answered with a 503 and counted by the MongoDB breaker
     except Exception as e:
         print(f"Error updating nominee {nominee_id}: {str(e)}")
         return {'error': 'Failed to update nominee'}, 500
@@ -492,32 +807,37 @@ def update_nominee(nominee_id):
 @jwt_required()
 def delete_category(category_id):
     try:
-        # First check if category exists
-        category = categories.find_one({'_id': ObjectId(category_id)})
+        # Mark the category deleted so public reads hide it at once; its votes
+        # and nominees are removed in batches by a background job. The name is
+        # released for reuse at once, since the unique name index still sees the document.
+        category = categories.find_one_and_update(
+            {'_id': ObjectId(category_id), **NOT_DELETED},
+            [{'$set': {
+                'deleted': True,
+                'deleted_at': datetime.datetime.now(datetime.UTC),
+                'deleted_name': '$name',
+                'name': f'deleted:{category_id}'
+            }}]
+        )
         if not category:
             return {'error': 'Category not found'}, 404
 
-        # Delete the category
-        result = categories.delete_one({'_id': ObjectId(category_id)})
-
-        # Delete all nominees for this category
-        nominees_result = nominees.delete_many({'category_id': category_id})
+        nominee_ids = [n['id'] for n in nominees.find({'category_id': category_id, **NOT_DELETED}, {'id': 1})]
+        nominees.update_many({'category_id': category_id}, {'$set': {'deleted': True}})
+        version = changes.record_deletes(db, 'category', [category_id])
+        changes.record_deletes(db, 'nominee', nominee_ids, version)
+        job = job_runner.enqueue('delete_category', {'category_id': category_id})
 
-        # Delete all votes for nominees in this category
-        votes_result = votes.delete_many({'category_id': category_id})
+        # Clear relevant caches
+        cache.clear()  # Clear all cache when categories change
 
-        if result.deleted_count > 0:
-            # Clear relevant caches
-            cache.clear()  # Clear all cache when categories change
-
-            return {
-                'message': f'Category "{category["name"]}" deleted successfully',
-                'deleted_nominees': nominees_result.deleted_count if hasattr(nominees_result, 'deleted_count') else 0,
-                'nominees_deleted': nominees_result.deleted_count if hasattr(nominees_result, 'deleted_count') else 0
-            }, 200
-        else:
-            return {'error': 'Failed to delete category'}, 500
+        return {
+            'message': f'Category "{category["name"]}" deleted successfully',
+            'job_id': job['id']
+        }, 202
 
+    except resilience.MONGO_OUTAGE_ERRORS:
+        raise  # Answered with a 503 and counted by the MongoDB breaker
     except Exception as e:
         print(f"Error deleting category {category_id}: {str(e)}")
         return {'error': 'Failed to delete category'}, 500
@@ -526,8 +846,13 @@ def delete_category(category_id):
 @jwt_required()
 def remove_nominee_image(nominee_id):
     try:
-        # Get nominee details
-        nominee = nominees.find_one({'_id': ObjectId(nominee_id)})
+        # Remove image_url and get the nominee as it was, in one round-trip
+        nominee = nominees.find_one_and_update(
+            {'_id': ObjectId(nominee_id)},
+            {'$unset': {'image_url': 1}, '$set': {'version': changes.next_version(db)}},
+            projection={'image_url': 1},
+            return_document=ReturnDocument.BEFORE
+        )
         if not nominee:
             return {'error': 'Nominee not found'}, 404
 
@@ -549,19 +874,12 @@ def remove_nominee_image(nominee_id):
                     print(f"Failed to delete S3 file: {filename}")
             except Exception as e:
                 print(f"Error deleting S3 file {filename}: {str(e)}")
-                # Continue with nominee update even if S3 deletion fails
-
-        # Update nominee to remove image_url
-        result = nominees.update_one(
-            {'_id': ObjectId(nominee_id)},
-            {'$unset': {'image_url': 1}}
-        )
+                # The nominee no longer points at the file, so a failed delete only leaves an orphan
 
-        if result.modified_count > 0:
-            return {'success': 'Image removed successfully'}, 200
-        else:
-            return {'error': 'Failed to remove image'}, 500
+        return {'success': 'Image removed successfully'}, 200
 
+    except resilience.MONGO_OUTAGE_ERRORS:
+        raise  # Answered with a 503 and counted by the MongoDB breaker
     except Exception as e:
         print(f"Error removing nominee image: {str(e)}")
         return {'error': 'Failed to remove image'}, 500
@@ -570,8 +888,8 @@ def remove_nominee_image(nominee_id):
 @jwt_required()
 def delete_nominee(nominee_id):
     try:
-        # Get nominee details before deletion to retrieve image_url
-        nominee = nominees.find_one({'_id': ObjectId(nominee_id)})
+        # Delete the nominee and get its image_url in one round-trip
+        nominee = nominees.find_one_and_delete({'_id': ObjectId(nominee_id)}, projection={'image_url': 1})
         if not nominee:
             return {'error': 'Nominee not found'}, 404
 
@@ -589,18 +907,19 @@ def delete_nominee(nominee_id):
                 print(f"Error deleting S3 file {filename}: {str(e)}")
                 # Continue with nominee deletion even if S3 deletion fails
 
-        result = nominees.delete_one({'_id': ObjectId(nominee_id)})
-
         # Delete all votes for this nominee
-        votes.delete_many({'nominee_id': nominee_id})
+        votes.delete_many({'nominee_id': vote_keys.id_match(nominee_id)})
+        vote_rollups.delete_many({'nominee_id': ObjectId(nominee_id)})
+        vote_counters.delete_many({'nominee_id': ObjectId(nominee_id)})
 
-        if result.deleted_count > 0:
-            # Clear relevant caches
-            cache.clear()  # Clear all cache when nominees change
+        changes.record_deletes(db, 'nominee', [nominee_id])
 
-            return {'message': 'Nominee deleted successfully'}, 200
-        else:
-            return {'error': 'Nominee not found'}, 404
+        # Clear relevant caches
+        cache.clear()  # Clear all cache when nominees change
+
+        return {'message': 'Nominee deleted successfully'}, 200
+    except resilience.MONGO_OUTAGE_ERRORS:
+        raise  # Answered with a 503 and counted by the MongoDB breaker
     except Exception as e:
         return {'error': f'Failed to delete nominee {e}'}, 500
 
@@ -610,91 +929,528 @@ def cast_vote():
     data = request.get_json()
 
     # Check if category exists and voting is not locked
-    category = categories.find_one({'id': data['category_id']})
+    category = categories.find_one(
+        {'id': data['category_id'], **NOT_DELETED}, {'_id': 0, 'voting_locked': 1, 'counter_shards': 1}
+    )
     if not category:
         return {'error': 'Category not found'}, 404
 
     if category.get('voting_locked', False):
         return {'error': 'Voting is locked for this category'}, 403
 
-    # Check for existing vote by this IP
-    existing_vote = votes.find_one({
-        'category_id': data['category_id'],
-        'voter_ip': get_client_ip()
-    })
+    if not validate_object_id(data.get('nominee_id', '')):
+        return {'error': 'Invalid nominee ID'}, 400
 
+    voter_ip = get_client_ip()
+    voter_query = vote_keys.voter_match(data['category_id'], voter_ip, VOTER_HASH_SECRET,
+                                        vote_keys.legacy_votes_remain(votes))
     vote_data = {
-        'nominee_id': data['nominee_id'],
-        'category_id': data['category_id'],
-        'voter_ip': get_client_ip(),
+        'nominee_id': ObjectId(data['nominee_id']),
+        'category_id': ObjectId(data['category_id']),
+        'voter_key': vote_keys.voter_key(voter_ip, VOTER_HASH_SECRET),
+        'voter_prefix': vote_keys.prefix_key(voter_ip, VOTER_HASH_SECRET),
         'created_at': datetime.datetime.now(datetime.UTC)
     }
+    # Replace this voter's vote (converting a legacy one to the compact schema)
+    # atomically; the old document says which nominee the vote moves from, so
+    # concurrent changes never take the same vote off a nominee twice
+    replace = {'$set': dict(vote_data), '$unset': {'voter_ip': ''}}
+    existing_vote = votes.find_one_and_update(voter_query, replace, projection={'nominee_id': 1})
+    if not existing_vote:
+        try:
+            votes.insert_one(vote_data)
+        except DuplicateKeyError:
+            # A concurrent first vote from the same voter was inserted in between
+            existing_vote = votes.find_one_and_update(voter_query, replace, projection={'nominee_id': 1})
+            if not existing_vote:
+                raise
 
     if existing_vote:
-        # Update existing vote
-        votes.update_one(
-            {'_id': existing_vote['_id']},
-            {'$set': vote_data}
-        )
-        vote_data['id'] = str(existing_vote['_id'])
-        vote_data['action'] = 'updated'
+        vote_data['_id'] = existing_vote['_id']
+        action = 'updated'
     else:
-        # Create new vote
-        result = votes.insert_one(vote_data)
-        vote_data['id'] = str(result.inserted_id)
-        vote_data['action'] = 'created'
+        action = 'created'
+
+    previous_nominee_id = str(existing_vote['nominee_id']) if existing_vote else None
+    if previous_nominee_id != data['nominee_id']:
+        try:
+            rollups.record_vote(vote_rollups, data['category_id'], data['nominee_id'],
+                                vote_data['created_at'], previous_nominee_id)
+        except Exception as e:
+            # The vote itself is stored; a missed bucket only affects trend charts
+            print(f"Error updating vote rollups: {str(e)}")
+            resilience.record_outage(e)
+        if category.get('counter_shards'):
+            try:
+                vote_tally.record_vote(vote_counters, data['category_id'], data['nominee_id'],
+                                       category['counter_shards'], previous_nominee_id)
+            except Exception as e:
+                # The vote itself is stored; recount the category so its tally catches up
+                print(f"Error updating vote counters, queueing a recount: {str(e)}")
+                resilience.record_outage(e)
+                try:
+                    job_runner.enqueue('recount_votes', {'category_id': data['category_id']})
+                except Exception as e:
+                    print(f"Error queueing vote recount for {data['category_id']}: {str(e)}")
+                    resilience.record_outage(e)
+
+    vote_guard.submit(voter_ip, data['category_id'], data['nominee_id'])
 
     # Clear results cache for this category
     cache.clear()  # Clear all cache when votes change
 
-    return json.loads(json_util.dumps(vote_data)), 201
+    return json.loads(json_util.dumps({**vote_keys.public_vote(vote_data), 'action': action})), 201
 
 @app.route('/api/vote/<category_id>', methods=['GET'])
 @limiter.limit("240/minute")  # More lenient for vote checking
 def get_user_vote(category_id):
     # Get user's current vote for this category
-    existing_vote = votes.find_one({
-        'category_id': category_id,
-        'voter_ip': get_client_ip()
-    }, {'_id': 0})
+    existing_vote = votes.find_one(vote_keys.voter_match(category_id, get_client_ip(), VOTER_HASH_SECRET,
+                                                         vote_keys.legacy_votes_remain(votes)))
 
     if existing_vote:
-        return json.loads(json_util.dumps(existing_vote)), 200
+        return json.loads(json_util.dumps(vote_keys.public_vote(existing_vote))), 200
     else:
         return {'vote': None}, 200
 
 @app.route('/api/results/<category_id>', methods=['GET'])
-@cache.cached(timeout=60, query_string=True)  # Cache for 1 minute
+@compression.cached_json(cache, timeout=60, query_string=True)  # Cache for 1 minute
 def get_results(category_id):
+    category = categories.find_one({'id': category_id, **NOT_DELETED}, {'_id': 1, 'results_frozen': 1, 'tally': 1})
+    if not category:
+        return {'error': 'Category not found'}, 404
+
+    # Closed-out categories are served from their immutable snapshot
+    if category.get('results_frozen'):
+        snapshot = results_snapshots.find_one({'category_id': category_id}, {'results': 1})
+        if snapshot:
+            return snapshot['results']
+
     pipeline = [
-        {'$match': {'category_id': category_id}},
+        {'$match': {'category_id': vote_keys.id_match(category_id)}},
         {'$group': {
-            '_id': '$nominee_id',
+            '_id': {'$toString': '$nominee_id'},
             'vote_count': {'$sum': 1}
         }},
         {'$sort': {'vote_count': -1}}
     ]
 
-    results = list(votes.aggregate(pipeline))
+    if category.get('tally') == 'sharded':
+        # Sum the nominee counters instead of scanning every vote
+        counts = vote_tally.totals(vote_counters, category_id)
+        results = sorted(
+            ({'_id': nominee_id, 'vote_count': count} for nominee_id, count in counts.items() if count > 0),
+            key=lambda result: result['vote_count'],
+            reverse=True
+        )
+    else:
+        results = list(votes.aggregate(pipeline))
 
-    # Get nominee details
+    # Get nominee details, all in one query
+    nominee_docs = {
+        nominee['id']: nominee
+        for nominee in nominees.find({'id': {'$in': [result['_id'] for result in results]}}, {'_id': 0})
+    }
     for result in results:
-        nominee = nominees.find_one({'id': result['_id']}, {'_id': 0})
-        result['nominee'] = nominee
+        result['nominee'] = nominee_docs.get(result['_id'])
         result['nominee_id'] = result['_id']
         del result['_id']
 
     return results
 
+@app.route('/api/admin/results/<category_id>/timeline', methods=['GET'])
+@jwt_required()
+def get_results_timeline(category_id):
+    """Net votes per nominee in each minute or hour bucket"""
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in rollups.GRANULARITIES:
+        return {'error': 'Granularity must be minute or hour'}, 400
+    if not validate_object_id(category_id):
+        return {'error': 'Invalid category ID'}, 400
+    try:
+        since = parse_timestamp(request.args['since']) if request.args.get('since') else None
+        until = parse_timestamp(request.args['until']) if request.args.get('until') else None
+    except ValueError:
+        return {'error': 'since and until must be ISO 8601 timestamps'}, 400
+
+    buckets = rollups.timeline(vote_rollups, category_id, granularity, since, until)
+    for bucket in buckets:
+        bucket['bucket'] = bucket['bucket'].replace(tzinfo=datetime.UTC).isoformat()
+    return {'category_id': category_id, 'granularity': granularity, 'buckets': buckets}
+
+@app.route('/api/admin/vote-flags', methods=['GET'])
+@jwt_required()
+def get_vote_flags():
+    """List the most recent vote-abuse flags"""
+    query = {}
+    category_id = request.args.get('category_id')
+    if category_id:
+        query['category_id'] = category_id
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+
+    flags = list(vote_flags.find(query, {'_id': 0}).sort('created_at', -1).limit(limit))
+    return json.loads(json_util.dumps(flags)), 200
+
+@app.route('/api/admin/import', methods=['POST'])
+@limiter.limit("10/minute")
+@jwt_required()
+@resilience.mongo_budget(30)  # Bulk upserts of a whole ballot
+def import_ballot():
+    """Create or update categories and nominees from a JSON or CSV ballot"""
+    try:
+        if 'file' in request.files:
+            upload = request.files['file']
+            text = upload.read().decode('utf-8-sig')
+            if upload.filename.lower().endswith('.json'):
+                ballot_categories = ballot_io.parse_ballot_json(json.loads(text))
+            else:
+                ballot_categories = ballot_io.parse_ballot_csv(text)
+        elif request.mimetype in ('text/csv', 'text/plain'):
+            ballot_categories = ballot_io.parse_ballot_csv(request.get_data(as_text=True))
+        else:
+            ballot_categories = ballot_io.parse_ballot_json(request.get_json())
+    except (ValueError, UnicodeDecodeError) as e:
+        return {'error': f'Invalid ballot: {str(e)}'}, 400
+
+    # Validate everything before writing anything
+    errors = []
+    for category in ballot_categories:
+        for error in validate_category_data(category):
+            errors.append(f'{category.get("name", "")}: {error}')
+        for nominee in category['nominees']:
+            for error in validate_nominee_data({**nominee, 'category_id': str(ObjectId())}):
+                errors.append(f'{category.get("name", "")} / {nominee.get("name", "")}: {error}')
+    names = [sanitize_input(category['name']) for category in ballot_categories]
+    if len(set(names)) != len(names):
+        errors.append('Category names must be unique')
+    if errors:
+        return jsonify({'error': 'Validation failed', 'details': errors}), 400
+
+    now = datetime.datetime.now(datetime.UTC)
+    version = changes.next_version(db)
+
+    # Categories are matched by name; new ones get their id at insert time
+    category_ops = []
+    for category in ballot_categories:
+        _id = ObjectId()
+        update = {}
+        if 'description' in category:
+            update['description'] = sanitize_input(category['description'])
+        if 'voting_locked' in category:
+            update['voting_locked'] = ballot_io.parse_bool(category['voting_locked'])
+        on_insert = {'_id': _id, 'id': str(_id), 'created_at': now,
+                     'tally': 'sharded', 'counter_shards': vote_tally.DEFAULT_SHARDS}
+        on_insert.update({k: v for k, v in {'description': '', 'voting_locked': False}.items()
+                          if k not in update})
+        if update:
+            update['updated_at'] = now
+        update['version'] = version
+        category_ops.append(UpdateOne(
+            {'name': sanitize_input(category['name']), **NOT_DELETED},
+            {'$set': update, '$setOnInsert': on_insert},
+            upsert=True
+        ))
+
+    try:
+        category_result = categories.bulk_write(category_ops, ordered=True)
+        category_ids = {
+            doc['name']: doc['id']
+            for doc in categories.find({'name': {'$in': names}, **NOT_DELETED}, {'_id': 0, 'name': 1, 'id': 1})
+        }
+
+        # Nominees are matched by name within their category
+        nominee_ops = []
+        for category, name in zip(ballot_categories, names):
+            for nominee in category['nominees']:
+                _id = ObjectId()
+                update = {'updated_at': now, 'version': version}
+                if 'description' in nominee:
+                    update['description'] = sanitize_input(nominee['description'])
+                for url_field in ('image_url', 'youtube_url'):
+                    if url_field in nominee:
+                        update[url_field] = nominee[url_field]
+                on_insert = {'_id': _id, 'id': str(_id), 'created_at': now}
+                on_insert.update({k: '' for k in ('description', 'image_url', 'youtube_url')
+                                  if k not in update})
+                nominee_ops.append(UpdateOne(
+                    {'category_id': category_ids[name], 'name': sanitize_input(nominee['name']), **NOT_DELETED},
+                    {'$set': update, '$setOnInsert': on_insert},
+                    upsert=True
+                ))
+        nominee_result = nominees.bulk_write(nominee_ops, ordered=True) if nominee_ops else None
+    except resilience.MONGO_OUTAGE_ERRORS:
+        raise  # Answered with a 503 and counted by the MongoDB breaker
+    except Exception as e:
+        print(f"Error importing ballot: {str(e)}")
+        return {'error': 'Failed to import ballot'}, 500
+
+    # Clear relevant caches
+    cache.clear()  # Clear all cache once for the whole import
+
+    return {
+        'categories_created': category_result.upserted_count,
+        'categories_updated': category_result.matched_count,
+        'nominees_created': nominee_result.upserted_count if nominee_result else 0,
+        'nominees_updated': nominee_result.matched_count if nominee_result else 0
+    }, 200
+
+@app.route('/api/admin/export', methods=['GET'])
+@jwt_required()
+@resilience.mongo_budget(None)  # Streamed; runs as long as the download does
+def export_ballot():
+    """Stream the current ballot as JSON or CSV"""
+    export_format = request.args.get('format', 'json')
+    if export_format not in ('json', 'csv'):
+        return {'error': 'Format must be json or csv'}, 400
+
+    category_docs = list(categories.find(NOT_DELETED, {'_id': 0}))
+    nominee_cursor = nominees.find(NOT_DELETED, {'_id': 0}).sort([('category_id', 1), ('_id', 1)])
+
+    if export_format == 'csv':
+        body = ballot_io.iter_export_csv(category_docs, nominee_cursor)
+        mimetype = 'text/csv'
+    else:
+        body = ballot_io.iter_export_json(category_docs, nominee_cursor)
+        mimetype = 'application/json'
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=ballot.{export_format}'}
+    )
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 query parameter as a UTC datetime"""
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.UTC)
+    return parsed
+
+@app.route('/api/admin/votes/export', methods=['GET'])
+@jwt_required()
+@resilience.mongo_budget(None)  # Streamed; runs as long as the download does
+def export_votes():
+    """Stream raw votes as gzip-compressed NDJSON or CSV"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return {'error': 'Format must be ndjson or csv'}, 400
+
+    query = {}
+    if request.args.get('category_id'):
+        query['category_id'] = vote_keys.id_match(request.args['category_id'])
+    try:
+        created_at = {}
+        if request.args.get('since'):
+            created_at['$gte'] = parse_timestamp(request.args['since'])
+        if request.args.get('until'):
+            created_at['$lt'] = parse_timestamp(request.args['until'])
+    except ValueError:
+        return {'error': 'since and until must be ISO 8601 timestamps'}, 400
+    if created_at:
+        query['created_at'] = created_at
+
+    batch_size = int(os.getenv('EXPORT_BATCH_SIZE', '5000'))
+    cursor = votes.find(query, batch_size=batch_size).sort('_id', 1)
+    records = vote_archive.iter_csv(cursor) if export_format == 'csv' else vote_archive.iter_ndjson(cursor)
+
+    return Response(
+        stream_with_context(vote_archive.gzip_stream(records)),
+        mimetype='application/gzip',
+        headers={'Content-Disposition': f'attachment; filename=votes.{export_format}.gz'}
+    )
+
+@app.route('/api/admin/categories/<category_id>/close-out', methods=['POST'])
+@jwt_required()
+def close_out_category(category_id):
+    """Lock a category, freeze its results and archive its votes in the background"""
+    data = request.get_json(silent=True) or {}
+    archive = data.get('archive', 's3')
+    if archive not in ('s3', 'file'):
+        return {'error': 'Archive must be s3 or file'}, 400
+
+    category = categories.find_one_and_update(
+        {'id': category_id, **NOT_DELETED},
+        {'$set': {
+            'voting_locked': True,
+            'updated_at': datetime.datetime.now(datetime.UTC),
+            'version': changes.next_version(db)
+        }}
+    )
+    if not category:
+        return {'error': 'Category not found'}, 404
+
+    job = job_runner.enqueue('close_out', {'category_id': category_id, 'archive': archive})
+    cache.clear()  # Clear all cache when categories change
+
+    return {'message': f'Closing out category "{category["name"]}"', 'job_id': job['id']}, 202
+
+@app.route('/api/admin/categories/<category_id>/publish', methods=['POST'])
+@jwt_required()
+def publish_category(category_id):
+    """Publish a locked category's results to S3 in the background"""
+    category = categories.find_one({'id': category_id, **NOT_DELETED}, {'name': 1, 'voting_locked': 1})
+    if not category:
+        return {'error': 'Category not found'}, 404
+    if not category.get('voting_locked'):
+        return {'error': 'Voting must be locked before results are published'}, 409
+
+    job = job_runner.enqueue('publish', {'category_id': category_id})
+    return {'message': f'Publishing results for "{category["name"]}"', 'job_id': job['id']}, 202
+
+@app.route('/api/admin/categories', methods=['PATCH'])
+@jwt_required()
+def bulk_update_categories():
+    """Lock or unlock many categories with one write and one cache invalidation"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get('voting_locked'), bool):
+        return {'error': 'voting_locked must be true or false'}, 400
+
+    query = dict(NOT_DELETED)
+    if not data.get('all'):
+        category_ids = data.get('category_ids')
+        if not isinstance(category_ids, list) or not category_ids:
+            return {'error': 'Provide category_ids or "all": true'}, 400
+        if not all(isinstance(_id, str) and validate_object_id(_id) for _id in category_ids):
+            return {'error': 'Invalid category ID'}, 400
+        query['id'] = {'$in': category_ids}
+
+    locking = data['voting_locked']
+    version = changes.next_version(db)
+    update = {'$set': {
+        'voting_locked': locking,
+        'updated_at': datetime.datetime.now(datetime.UTC),
+        'version': version
+    }}
+    if locking:
+        query['voting_locked'] = {'$ne': True}
+    else:
+        query['voting_locked'] = True
+        query['results_frozen'] = {'$ne': True}
+        update['$unset'] = {'published': ''}
+
+    result = categories.update_many(query, update)
+
+    if locking and result.modified_count:
+        # The version is unique to this write, so it picks out exactly the categories it locked
+        for category in categories.find({'version': version, 'voting_locked': True}, {'_id': 0, 'id': 1}):
+            job_runner.enqueue('publish', {'category_id': category['id']})
+
+    # Clear relevant caches
+    cache.clear()  # Clear all cache once for the whole batch
+
+    return {'matched': result.matched_count, 'modified': result.modified_count}, 200
+
+# Versions that may be allocated but not yet written; delta syncs overlap by this much
+CHANGES_VERSION_LAG = int(os.getenv('CHANGES_VERSION_LAG', '100'))
+
+@app.route('/api/admin/changes', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """Categories and nominees changed or deleted since a version"""
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return {'error': 'since must be an integer version'}, 400
+
+    return changes.changes_since(db, since, NOT_DELETED, CHANGES_VERSION_LAG)
+
+@app.route('/api/admin/jobs', methods=['GET'])
+@jwt_required()
+def get_jobs():
+    """List recent background jobs"""
+    query = {}
+    if request.args.get('status'):
+        query['status'] = request.args['status']
+    limit = min(request.args.get('limit', 50, type=int), 500)
+
+    recent = list(jobs.find(query, {'_id': 0}).sort('created_at', -1).limit(limit))
+    return json.loads(json_util.dumps(recent)), 200
+
+@app.route('/api/admin/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Status and progress of a background job"""
+    job = jobs.find_one({'id': job_id}, {'_id': 0})
+    if not job:
+        return {'error': 'Job not found'}, 404
+    return json.loads(json_util.dumps(job)), 200
+
+@app.route('/api/admin/jobs/<job_id>/retry', methods=['POST'])
+@jwt_required()
+def retry_job(job_id):
+    """Requeue a failed background job"""
+    job = job_runner.retry(job_id)
+    if not job:
+        if jobs.find_one({'id': job_id}, {'_id': 1}):
+            return {'error': 'Only failed jobs can be retried'}, 409
+        return {'error': 'Job not found'}, 404
+    job.pop('_id', None)
+    return json.loads(json_util.dumps(job)), 202
+
+@app.route('/api/admin/query-stats', methods=['GET'])
+@jwt_required()
+@resilience.without_mongo
+def get_query_stats():
+    """Most expensive MongoDB query shapes seen by this worker"""
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in ('total_ms', 'count', 'max_ms', 'avg_ms', 'slow_count'):
+        return {'error': 'Invalid sort field'}, 400
+    limit = min(request.args.get('limit', 20, type=int), 500)
+
+    return {
+        'since': query_observer.started_at.isoformat(),
+        'slow_ms': query_observer.slow_ms,
+        'shapes': query_observer.top(limit=limit, sort=sort)
+    }, 200
+
+@app.route('/api/admin/query-stats', methods=['DELETE'])
+@jwt_required()
+@resilience.without_mongo
+def reset_query_stats():
+    """Start a fresh query statistics window"""
+    query_observer.reset()
+    return {'message': 'Query statistics reset'}, 200
+
+@app.route('/api/metrics', methods=['GET'])
+@limiter.exempt
+@resilience.handles_outage
+def get_metrics():
+    """Prometheus metrics for this worker"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return {'error': 'Unauthorized'}, 401
+    return Response(instrumentation.metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Serve React app for all non-API routes (catch-all)
+static_site = static_files.StaticSite(
+    os.getenv('FRONTEND_BUILD_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'build')
+)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
+@resilience.handles_outage
 def serve_react_app(path):
-    build_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'build')
-    if path != "" and os.path.exists(os.path.join(build_dir, path)):
-        return send_from_directory(build_dir, path)
-    else:
-        return send_from_directory(build_dir, 'index.html')
+    return static_site.serve(path, request.accept_encodings)
+
+def reinit_after_fork():
+    """Give a gunicorn worker forked from a preloaded master its own clients and threads
+
+    MongoClient and its monitor threads do not survive a fork, so every handle
+    on the master's client is replaced. Read-only state built at import (the
+    route table, the static build index) stays shared copy-on-write.
+    """
+    global s3_client
+    s3_client = create_s3_client()
+    instrumentation.instrument_s3(s3_client)
+    connect_database()
+    vote_guard.flags = vote_flags
+    job_runner.jobs = jobs
+    nominee_search.db = db
+    nominee_search.index = None
+    if instrumentation.profiler is not None:
+        instrumentation.profiler.start()
+    start_background_threads()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
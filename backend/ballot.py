@@ -0,0 +1,42 @@
+"""
+Materialized public ballot for the voting page.
+
+All categories with their nominees grouped and trimmed to public fields,
+serialized once and compressed by compression.encode, so /api/ballot serves
+bytes from memory.
+"""
+import json
+
+from ballot_io import group_by_category
+from changes import version_state
+
+PUBLIC_CATEGORY_FIELDS = ('id', 'name', 'description', 'voting_locked')
+PUBLIC_NOMINEE_FIELDS = ('id', 'name', 'description', 'category_id', 'image_url', 'youtube_url')
+
+
+def build(db, not_deleted):
+    """Render the ballot along with the change version it reflects
+
+    settled is False while writes that took the version may still be landing;
+    such a ballot has to be rebuilt even if the version has not moved.
+    """
+    # Read the version first; a write during the build then shows up as stale
+    version, settled = version_state(db)
+    # Documents are written with their id, but never publish one that lacks it
+    query = {**not_deleted, 'id': {'$exists': True}}
+    category_docs = db['categories'].find(
+        query, {'_id': 0, **{field: 1 for field in PUBLIC_CATEGORY_FIELDS}}
+    )
+    nominee_cursor = db['nominees'].find(
+        query, {'_id': 0, **{field: 1 for field in PUBLIC_NOMINEE_FIELDS}}
+    ).sort([('category_id', 1), ('_id', 1)])
+
+    ballot = []
+    for category, group in group_by_category(list(category_docs), nominee_cursor):
+        entry = {field: category.get(field, '') for field in PUBLIC_CATEGORY_FIELDS}
+        entry['voting_locked'] = bool(category.get('voting_locked'))
+        entry['nominees'] = group
+        ballot.append(entry)
+
+    body = json.dumps({'categories': ballot}, separators=(',', ':')).encode('utf-8')
+    return {'version': version, 'settled': settled, 'body': body}
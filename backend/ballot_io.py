@@ -0,0 +1,120 @@
+"""
+Ballot definition import/export formats.
+
+A ballot is a list of categories, each carrying its nominees:
+
+    {"categories": [{"name": "Best Picture", "description": "...",
+                     "voting_locked": false,
+                     "nominees": [{"name": "...", "description": "...",
+                                   "image_url": "...", "youtube_url": "..."}]}]}
+
+The CSV form has one row per nominee; a row with an empty nominee name only
+declares its category.
+"""
+import csv
+import io
+import json
+
+CSV_COLUMNS = ['category', 'category_description', 'voting_locked',
+               'name', 'description', 'image_url', 'youtube_url']
+
+CATEGORY_FIELDS = ('name', 'description', 'voting_locked')
+NOMINEE_FIELDS = ('name', 'description', 'image_url', 'youtube_url')
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def parse_ballot_json(data):
+    """Validate the overall shape of a JSON ballot and return its categories"""
+    if isinstance(data, list):
+        data = {'categories': data}
+    if not isinstance(data, dict) or not isinstance(data.get('categories'), list):
+        raise ValueError('Ballot must be an object with a "categories" list')
+    ballot = []
+    for category in data['categories']:
+        if not isinstance(category, dict):
+            raise ValueError('Each category must be an object')
+        nominees = category.get('nominees') or []
+        if not isinstance(nominees, list) or not all(isinstance(n, dict) for n in nominees):
+            raise ValueError(f'Nominees for "{category.get("name", "")}" must be a list of objects')
+        entry = {key: category[key] for key in CATEGORY_FIELDS if key in category}
+        entry['nominees'] = [{key: n[key] for key in NOMINEE_FIELDS if key in n} for n in nominees]
+        ballot.append(entry)
+    return ballot
+
+
+def parse_ballot_csv(text):
+    """Group CSV rows into the same structure parse_ballot_json returns"""
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or 'category' not in reader.fieldnames:
+        raise ValueError('CSV must have a "category" column')
+    ballot = []
+    by_name = {}
+    for row in reader:
+        category_name = (row.get('category') or '').strip()
+        if not category_name:
+            continue
+        category = by_name.get(category_name)
+        if category is None:
+            category = by_name[category_name] = {'name': category_name, 'nominees': []}
+            ballot.append(category)
+        if row.get('category_description'):
+            category['description'] = row['category_description']
+        if row.get('voting_locked'):
+            category['voting_locked'] = parse_bool(row['voting_locked'])
+        if (row.get('name') or '').strip():
+            category['nominees'].append({key: row[key] for key in NOMINEE_FIELDS if row.get(key)})
+    return ballot
+
+
+def group_by_category(category_docs, nominee_cursor):
+    """Pair categories with nominees from a cursor sorted by category_id"""
+    nominees_iter = iter(nominee_cursor)
+    pending = next(nominees_iter, None)
+    for category in sorted(category_docs, key=lambda c: c['id']):
+        # Skip nominees whose category is not part of the export
+        while pending is not None and pending['category_id'] < category['id']:
+            pending = next(nominees_iter, None)
+        group = []
+        while pending is not None and pending['category_id'] == category['id']:
+            group.append(pending)
+            pending = next(nominees_iter, None)
+        yield category, group
+
+
+def iter_export_json(category_docs, nominee_cursor):
+    """Stream a ballot as JSON, one category at a time"""
+    yield '{"categories": ['
+    for i, (category, group) in enumerate(group_by_category(category_docs, nominee_cursor)):
+        entry = {key: category.get(key) for key in ('id',) + CATEGORY_FIELDS}
+        entry['voting_locked'] = bool(entry['voting_locked'])
+        entry['nominees'] = [{key: n.get(key, '') for key in ('id',) + NOMINEE_FIELDS} for n in group]
+        yield (',' if i else '') + json.dumps(entry)
+    yield ']}\n'
+
+
+def iter_export_csv(category_docs, nominee_cursor):
+    """Stream a ballot as CSV rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for category, group in group_by_category(category_docs, nominee_cursor):
+        prefix = [category.get('name', ''), category.get('description', ''),
+                  'true' if category.get('voting_locked') else 'false']
+        if not group:
+            writer.writerow(prefix + ['', '', '', ''])
+        for nominee in group:
+            writer.writerow(prefix + [nominee.get(key, '') for key in NOMINEE_FIELDS])
+        yield flush()
@@ -0,0 +1,778 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the voting API.
+
+Seeds categories, nominees and votes in the same shape database_setup.py
+writes, then drives the Flask app in-process with concurrent workloads and
+prints per-endpoint throughput and latency percentiles as JSON.
+
+Runs fully offline: pass --mongo mongomock (default) or a local mongod URI.
+S3 is always served by moto, so no AWS credentials are needed.
+
+    python benchmark.py api --votes 1000000 --duration 30 --output before.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+# Benchmarks never talk to real AWS
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('S3_BUCKET_NAME', 'napling-benchmark')
+os.environ.setdefault('S3_BUCKET_PATH', 'uploads')
+os.environ.setdefault('ADMIN_PASSWORD', 'benchmark-admin')
+
+SEED_BATCH_SIZE = 10000
+
+
+def load_app(mongo):
+    """Import app.py against mongomock or a local mongod, with S3 mocked by moto"""
+    if mongo == 'mongomock':
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+    else:
+        os.environ['MONGODB_URI'] = mongo
+        os.environ['MONGODB_SSL'] = 'false'
+
+    from moto import mock_aws
+    import boto3
+    mock = mock_aws()
+    mock.start()
+    boto3.client('s3', region_name=os.environ['AWS_REGION']).create_bucket(
+        Bucket=os.environ['S3_BUCKET_NAME']
+    )
+
+    import app as app_module
+    app_module.limiter.enabled = False
+    return app_module
+
+
+def voter_ip(index):
+    """Deterministic unique IPv4 address for the n-th voter"""
+    return f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+
+
+def seed(app_module, num_categories, nominees_per_category, num_votes, rng, create_indexes=True, describe=None):
+    """Create a synthetic ballot and spread votes over it
+
+    describe(j) may return a (name, description) pair for the j-th nominee of a category.
+    Every other category, starting with the first, counts its votes in sharded
+    counters like categories created through the API; the rest use the
+    aggregation path of categories that predate them.
+    """
+    from bson import ObjectId
+
+    app_module.categories.delete_many({})
+    app_module.nominees.delete_many({})
+    app_module.votes.delete_many({})
+    app_module.vote_rollups.delete_many({})
+    app_module.vote_counters.delete_many({})
+    if create_indexes:
+        # Same indexes database_setup.py creates. Skipped on mongomock, which
+        # checks unique indexes with a full scan per insert.
+        app_module.vote_keys.ensure_indexes(app_module.votes)
+        app_module.vote_counters.create_index([("category_id", 1), ("nominee_id", 1), ("shard", 1)], unique=True)
+        app_module.nominees.create_index([("category_id", 1), ("_id", 1)])
+        app_module.categories.create_index([("name", 1)], unique=True)
+
+    now = datetime.datetime.now(datetime.UTC)
+    category_ids = []
+    category_docs = []
+    for i in range(num_categories):
+        _id = ObjectId()
+        category_ids.append(str(_id))
+        category_docs.append({
+            '_id': _id,
+            'id': str(_id),
+            'name': f'Benchmark Category {i}',
+            'description': f'Synthetic category {i}',
+            'voting_locked': False,
+            'created_at': now
+        })
+        if i % 2 == 0:
+            category_docs[-1].update(tally='sharded', counter_shards=app_module.vote_tally.DEFAULT_SHARDS)
+    app_module.categories.insert_many(category_docs)
+
+    ballot = {}
+    nominee_docs = []
+    for category_id in category_ids:
+        ballot[category_id] = []
+        for j in range(nominees_per_category):
+            _id = ObjectId()
+            ballot[category_id].append(str(_id))
+            name, description = describe(j) if describe else (f'Nominee {j}', 'Synthetic nominee ' * 4)
+            nominee_docs.append({
+                '_id': _id,
+                'id': str(_id),
+                'name': name,
+                'description': description,
+                'category_id': category_id,
+                'image_url': f'https://via.placeholder.com/300x200?text=Nominee+{j}',
+                'youtube_url': '',
+                'created_at': now
+            })
+    app_module.nominees.insert_many(nominee_docs)
+
+    # Skew votes towards the first nominees so results are not uniform
+    weights = [1.0 / (rank + 1) for rank in range(nominees_per_category)]
+    batch = []
+    for i in range(num_votes):
+        category_id = category_ids[i % num_categories]
+        batch.append({
+            'nominee_id': ObjectId(rng.choices(ballot[category_id], weights)[0]),
+            'category_id': ObjectId(category_id),
+            'voter_key': app_module.vote_keys.voter_key(voter_ip(i // num_categories),
+                                                        app_module.VOTER_HASH_SECRET),
+            'voter_prefix': app_module.vote_keys.prefix_key(voter_ip(i // num_categories),
+                                                            app_module.VOTER_HASH_SECRET),
+            'created_at': now - datetime.timedelta(seconds=num_votes - i)
+        })
+        if len(batch) >= SEED_BATCH_SIZE:
+            app_module.votes.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        app_module.votes.insert_many(batch, ordered=False)
+
+    # Nothing is voting yet, so the backfill puts every seeded vote in the base shard
+    for category in category_docs:
+        if category.get('tally') == 'sharded':
+            app_module.vote_tally.enable(app_module.db, category['id'], category['counter_shards'])
+
+    app_module.cache.clear()
+    return ballot
+
+
+class Recorder:
+    """Thread-safe latency collector keyed by endpoint"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds, ok=True):
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            endpoints[name] = summarize(samples, elapsed)
+            endpoints[name]['errors'] = self.errors.get(name, 0)
+        total = [s for samples in self.samples.values() for s in samples]
+        return {
+            'elapsed_seconds': round(elapsed, 3),
+            'total': summarize(total, elapsed),
+            'endpoints': endpoints
+        }
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100.0 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(samples, elapsed):
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0
+    }
+
+
+# Browsers always offer compression; measure the encoded responses they get
+BROWSER_HEADERS = {'Accept-Encoding': 'gzip, deflate, br'}
+
+
+def timed_request(recorder, client, name, method, url, **kwargs):
+    start = time.perf_counter()
+    response = client.open(url, method=method, **kwargs)
+    recorder.record(name, time.perf_counter() - start, response.status_code < 400)
+    return response
+
+
+class ApiWorkload:
+    """Vote storms, results polling and Home.js page loads against one ballot"""
+
+    def __init__(self, ballot, rng):
+        self.ballot = ballot
+        self.category_ids = list(ballot)
+        self.rng = rng
+        self._next_voter = 0
+        self.lock = threading.Lock()
+
+    def new_voter(self):
+        with self.lock:
+            self._next_voter += 1
+            # Stay clear of the 10.0.0.0/8 range used by seeded votes
+            return f"172.{16 + (self._next_voter >> 16) % 16}.{(self._next_voter >> 8) & 255}.{self._next_voter & 255}"
+
+    def vote(self, client, recorder):
+        category_id = self.rng.choice(self.category_ids)
+        timed_request(recorder, client, 'POST /api/vote', 'POST', '/api/vote',
+                      json={'category_id': category_id,
+                            'nominee_id': self.rng.choice(self.ballot[category_id])},
+                      headers={'X-Forwarded-For': self.new_voter()})
+
+    def results(self, client, recorder):
+        category_id = self.rng.choice(self.category_ids)
+        timed_request(recorder, client, 'GET /api/results/<category_id>', 'GET',
+                      f'/api/results/{category_id}', headers=BROWSER_HEADERS)
+
+    def page_load(self, client, recorder):
+        """Replay the requests Home.js makes on first render"""
+        start = time.perf_counter()
+        headers = {'X-Forwarded-For': self.new_voter()}
+        timed_request(recorder, client, 'GET /api/ballot', 'GET', '/api/ballot', headers=BROWSER_HEADERS)
+        for category_id in self.category_ids:
+            timed_request(recorder, client, 'GET /api/vote/<category_id>', 'GET',
+                          f'/api/vote/{category_id}', headers=headers)
+        recorder.record('page_load (Home.js)', time.perf_counter() - start)
+
+
+def parse_mix(mix):
+    """Parse 'vote=60,results=20,page=20' into (names, weights)"""
+    names, weights = [], []
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        names.append(name.strip())
+        weights.append(float(weight or 1))
+    return names, weights
+
+
+def run_concurrently(app_module, operation, threads, duration, max_ops=None):
+    """Call operation(client) from N threads until the duration or op budget runs out"""
+    deadline = time.perf_counter() + duration
+    counter = {'ops': 0}
+    lock = threading.Lock()
+
+    def worker():
+        client = app_module.app.test_client()
+        while time.perf_counter() < deadline:
+            if max_ops is not None:
+                with lock:
+                    if counter['ops'] >= max_ops:
+                        return
+                    counter['ops'] += 1
+            operation(client)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(args, results, output=None):
+    document = {
+        'benchmark': args.command,
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now(datetime.UTC).isoformat(),
+        'python': platform.python_version(),
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('command', 'output', 'func')},
+        **results
+    }
+    text = json.dumps(document, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+def bench_api(args):
+    """Mixed API workload"""
+    rng = random.Random(args.seed)
+    app_module = load_app(args.mongo)
+    print(f"Seeding {args.categories} categories x {args.nominees} nominees, {args.votes} votes...",
+          file=sys.stderr)
+    seed_start = time.perf_counter()
+    ballot = seed(app_module, args.categories, args.nominees, args.votes, rng,
+                  create_indexes=args.mongo != 'mongomock')
+    seed_seconds = time.perf_counter() - seed_start
+
+    workload = ApiWorkload(ballot, rng)
+    names, weights = parse_mix(args.mix)
+    operations = {'vote': workload.vote, 'results': workload.results, 'page': workload.page_load}
+    recorder = Recorder()
+
+    def operation(client):
+        operations[rng.choices(names, weights)[0]](client, recorder)
+
+    if args.warmup:
+        run_concurrently(app_module, operation, args.threads, args.warmup)
+        recorder = Recorder()
+
+    elapsed = run_concurrently(app_module, operation, args.threads, args.duration)
+    results = recorder.summary(elapsed)
+    results['seed_seconds'] = round(seed_seconds, 3)
+    report(args, results, args.output)
+
+
+def admin_headers(app_module):
+    """Authorization header for admin-only endpoints"""
+    from flask_jwt_extended import create_access_token
+    with app_module.app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity="admin")}'}
+
+
+def bench_export(args):
+    """Stream the full votes collection through /api/admin/votes/export"""
+    app_module = load_app(args.mongo)
+    print(f"Seeding {args.votes} votes...", file=sys.stderr)
+    seed(app_module, args.categories, args.nominees, args.votes, random.Random(args.seed),
+         create_indexes=args.mongo != 'mongomock')
+
+    client = app_module.app.test_client()
+    headers = admin_headers(app_module)
+    results = {}
+    for export_format in args.formats.split(','):
+        if args.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        response = client.get(f'/api/admin/votes/export?format={export_format}',
+                              headers=headers, buffered=False)
+        compressed_bytes = 0
+        first_byte = None
+        for chunk in response.response:
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            compressed_bytes += len(chunk)
+        elapsed = time.perf_counter() - start
+        response.close()
+
+        results[export_format] = {
+            'votes': args.votes,
+            'elapsed_seconds': round(elapsed, 3),
+            'time_to_first_byte_ms': round((first_byte or 0) * 1000, 3),
+            'votes_per_second': round(args.votes / elapsed, 1),
+            'compressed_mb': round(compressed_bytes / 1e6, 3),
+            'compressed_mb_per_second': round(compressed_bytes / 1e6 / elapsed, 3)
+        }
+        if args.trace_memory:
+            results[export_format]['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 3)
+            tracemalloc.stop()
+    report(args, {'formats': results}, args.output)
+
+
+def bench_contention(args):
+    """Votes per second a single nominee sustains with different counter shard counts"""
+    app_module = load_app(args.mongo)
+    rng = random.Random(args.seed)
+    results = {}
+    for shards in [int(k) for k in args.shards.split(',')]:
+        ballot = seed(app_module, 1, 1, 0, rng, create_indexes=args.mongo != 'mongomock')
+        category_id = next(iter(ballot))
+        nominee_id = ballot[category_id][0]
+        app_module.categories.update_one({'id': category_id},
+                                         {'$set': {'tally': 'sharded', 'counter_shards': shards}})
+        recorder = Recorder()
+
+        if args.through_api:
+            workload = ApiWorkload(ballot, rng)
+
+            def operation(client):
+                workload.vote(client, recorder)
+        else:
+            def operation(client):
+                start = time.perf_counter()
+                app_module.vote_tally.record_vote(app_module.vote_counters, category_id, nominee_id, shards)
+                recorder.record('counter $inc', time.perf_counter() - start)
+
+        elapsed = run_concurrently(app_module, operation, args.threads, args.duration)
+        summary = recorder.summary(elapsed)['total']
+        summary['counted'] = app_module.vote_tally.totals(app_module.vote_counters, category_id).get(nominee_id, 0)
+        results[f'shards={shards}'] = summary
+    report(args, {'shards': results}, args.output)
+
+
+def bench_login_burst(args):
+    """Vote latency while a burst of admin logins is hashing passwords"""
+    app_module = load_app(args.mongo)
+    passwords = app_module.passwords
+    rng = random.Random(args.seed)
+    ballot = seed(app_module, args.categories, args.nominees, args.votes, rng,
+                  create_indexes=args.mongo != 'mongomock')
+    workload = ApiWorkload(ballot, rng)
+    credentials = {'username': 'admin', 'password': os.environ['ADMIN_PASSWORD']}
+
+    def run_phase(burst):
+        recorder = Recorder()
+
+        def login(client):
+            timed_request(recorder, client, 'POST /api/auth/login', 'POST', '/api/auth/login', json=credentials)
+
+        burst_thread = None
+        if burst:
+            burst_thread = threading.Thread(
+                target=run_concurrently, args=(app_module, login, args.login_threads, args.duration)
+            )
+            burst_thread.start()
+        elapsed = run_concurrently(app_module, lambda client: workload.vote(client, recorder),
+                                   args.threads, args.duration)
+        if burst_thread:
+            burst_thread.join()
+        return recorder.summary(elapsed)['endpoints']
+
+    results = {'no burst': run_phase(False), 'burst': run_phase(True)}
+
+    # The same burst with the host cap lifted, i.e. hashing on every request thread
+    passwords.HASH_SLOTS = 0
+    results['burst, uncapped'] = run_phase(True)
+    report(args, {'hash_method': passwords.HASH_METHOD, 'phases': results}, args.output)
+
+
+def process_memory(pid):
+    """(RSS, PSS) of a process in bytes; PSS splits shared pages between their users"""
+    rss = pss = 0
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Rss:'):
+                rss = int(line.split()[1]) * 1024
+            elif line.startswith('Pss:'):
+                pss = int(line.split()[1]) * 1024
+    return rss, pss
+
+
+def child_pids(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def bench_boot(args):
+    """Boot time and memory of N gunicorn workers, with and without preload (Linux only)"""
+    import queue
+    import socket
+
+    if args.mongo == 'mongomock':
+        sys.exit('boot starts real gunicorn processes; pass --mongo with a local mongod URI')
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for preload in (False, True):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        env = dict(os.environ, MONGODB_URI=args.mongo, MONGODB_SSL='false', GUNICORN_WORKERS=str(args.workers),
+                   GUNICORN_PRELOAD=str(preload).lower(), GUNICORN_BIND=f'127.0.0.1:{port}')
+        start = time.perf_counter()
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', args.app],
+                                  cwd=backend_dir, env=env, stderr=subprocess.PIPE, text=True)
+        lines = queue.Queue()
+        threading.Thread(target=lambda: [lines.put(line) for line in server.stderr], daemon=True).start()
+        try:
+            ready = 0
+            while ready < args.workers:
+                line = lines.get(timeout=args.boot_timeout)
+                ready += 'Worker ready' in line
+            boot_seconds = time.perf_counter() - start
+            # Let import-time garbage settle before sampling
+            time.sleep(args.settle)
+            workers = child_pids(server.pid)
+            master = process_memory(server.pid)
+            per_worker = [process_memory(pid) for pid in workers]
+        finally:
+            server.terminate()
+            server.wait()
+        results['preload' if preload else 'no preload'] = {
+            'workers': len(workers),
+            'boot_seconds': round(boot_seconds, 3),
+            'master_rss_mb': round(master[0] / 1e6, 1),
+            'worker_rss_mb': [round(rss / 1e6, 1) for rss, _ in per_worker],
+            'total_rss_mb': round((master[0] + sum(rss for rss, _ in per_worker)) / 1e6, 1),
+            'total_pss_mb': round((master[1] + sum(pss for _, pss in per_worker)) / 1e6, 1)
+        }
+    report(args, {'modes': results}, args.output)
+
+
+class LatencyProxy:
+    """TCP proxy that holds every chunk coming back from the upstream for `latency` seconds"""
+
+    def __init__(self, upstream_host, upstream_port):
+        import socket
+
+        self.upstream = (upstream_host, upstream_port)
+        self.latency = 0.0
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        import socket
+
+        while True:
+            downstream, _ = self.listener.accept()
+            upstream = socket.create_connection(self.upstream)
+            threading.Thread(target=self._pump, args=(downstream, upstream, False), daemon=True).start()
+            threading.Thread(target=self._pump, args=(upstream, downstream, True), daemon=True).start()
+
+    def _pump(self, source, target, delayed):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if delayed and self.latency:
+                    time.sleep(self.latency)
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            source.close()
+            target.close()
+
+
+def bench_faults(args):
+    """Read and vote latency while MongoDB is made slow by a latency-injecting proxy"""
+    from pymongo import uri_parser
+
+    if args.mongo == 'mongomock':
+        sys.exit('faults proxies a real MongoDB; pass --mongo with a local mongod URI')
+    host, port = uri_parser.parse_uri(args.mongo)['nodelist'][0]
+    proxy = LatencyProxy(host, port)
+    app_module = load_app(f'mongodb://127.0.0.1:{proxy.port}/?directConnection=true')
+    rng = random.Random(args.seed)
+    ballot = seed(app_module, args.categories, args.nominees, args.votes, rng)
+    workload = ApiWorkload(ballot, rng)
+
+    def operation(client, recorder):
+        choice = rng.random()
+        if choice < 0.4:
+            name, url = 'GET /api/categories', '/api/categories'
+        elif choice < 0.8:
+            name, url = 'GET /api/results/<category_id>', f'/api/results/{rng.choice(workload.category_ids)}'
+        else:
+            workload.vote(client, recorder)
+            return
+        response = timed_request(recorder, client, name, 'GET', url)
+        if 'Warning' in response.headers:
+            recorder.record(f'{name} (stale)', 0)
+
+    results = {}
+    for phase, latency in (('healthy', 0.0), ('slow', args.latency_ms / 1000), ('recovered', 0.0)):
+        proxy.latency = latency
+        recorder = Recorder()
+        elapsed = run_concurrently(app_module, lambda client: operation(client, recorder), args.threads, args.duration)
+        results[phase] = recorder.summary(elapsed)['endpoints']
+        results[phase]['breaker'] = app_module.resilience.mongo_breaker.state
+    report(args, {'phases': results}, args.output)
+
+
+SEARCH_WORDS = ('sleepy', 'napster', 'pillow', 'dream', 'cozy', 'blanket', 'snooze', 'siesta', 'lullaby',
+                'midnight', 'drowsy', 'hammock', 'yawn', 'slumber', 'nightcap', 'doze', 'catnap', 'moon',
+                'starlight', 'quilt', 'velvet', 'whisper', 'cloud', 'feather', 'hush', 'twilight')
+
+
+def bench_search(args):
+    """GET /api/nominees/search latency against a ballot of varied nominee names"""
+    app_module = load_app(args.mongo)
+    rng = random.Random(args.seed)
+
+    def describe(j):
+        words = rng.sample(SEARCH_WORDS, 2)
+        return f'{words[0].title()} {words[1].title()} {j}', ' '.join(rng.choices(SEARCH_WORDS, k=12))
+
+    print(f"Seeding {args.categories * args.nominees} nominees...", file=sys.stderr)
+    ballot = seed(app_module, args.categories, args.nominees, 0, rng,
+                  create_indexes=args.mongo != 'mongomock', describe=describe)
+    category_ids = list(ballot)
+
+    client = app_module.app.test_client()
+    start = time.perf_counter()
+    client.get('/api/nominees/search?q=nap')
+    build_seconds = time.perf_counter() - start
+
+    recorder = Recorder()
+
+    def operation(client):
+        # Mostly what a typist sends: a partial word, sometimes two, sometimes scoped
+        word = rng.choice(SEARCH_WORDS)
+        query = word[:rng.randint(2, len(word))]
+        if rng.random() < 0.3:
+            query = f'{rng.choice(SEARCH_WORDS)} {query}'
+        url = f'/api/nominees/search?q={query}'
+        if rng.random() < 0.3:
+            url += f'&category_id={rng.choice(category_ids)}'
+        timed_request(recorder, client, 'GET /api/nominees/search', 'GET', url)
+
+    elapsed = run_concurrently(app_module, operation, args.threads, args.duration)
+    results = recorder.summary(elapsed)
+    results['nominees'] = args.categories * args.nominees
+    results['index_build_seconds'] = round(build_seconds, 3)
+    results['target_p95_ms'] = args.target_p95_ms
+    results['meets_target'] = results['total']['p95_ms'] <= args.target_p95_ms
+    report(args, results, args.output)
+
+
+MONGOMOCK_COMMANDS = (
+    'find', 'find_one', 'aggregate', 'count_documents', 'distinct', 'insert_one', 'insert_many',
+    'update_one', 'update_many', 'replace_one', 'delete_one', 'delete_many', 'bulk_write',
+    'find_one_and_update', 'find_one_and_delete', 'find_one_and_replace'
+)
+
+
+def count_mongomock_commands(instrumentation):
+    """Feed mongomock calls into the per-request command count, which real
+    drivers get from command monitoring (one call counts as one command)"""
+    import mongomock
+    depth = threading.local()
+
+    def counting(method):
+        def wrapper(*args, **kwargs):
+            # mongomock implements some methods on top of others; count the outermost call
+            if not getattr(depth, 'value', 0):
+                instrumentation.count_request_command()
+            depth.value = getattr(depth, 'value', 0) + 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                depth.value -= 1
+        return wrapper
+
+    for name in MONGOMOCK_COMMANDS:
+        setattr(mongomock.Collection, name, counting(getattr(mongomock.Collection, name)))
+
+
+def bench_commands(args):
+    """MongoDB commands issued by one request to each handler that reads and writes documents"""
+    app_module = load_app(args.mongo)
+    if args.mongo == 'mongomock':
+        count_mongomock_commands(app_module.instrumentation)
+    rng = random.Random(args.seed)
+    ballot = seed(app_module, args.categories, args.nominees, args.votes, rng,
+                  create_indexes=args.mongo != 'mongomock')
+    category_id, nominee_ids = next(iter(ballot.items()))
+    client = app_module.app.test_client()
+    headers = admin_headers(app_module)
+    voter = {'X-Forwarded-For': voter_ip(args.votes + 1)}
+    metrics = app_module.instrumentation.metrics
+
+    def commands_so_far():
+        return sum(value for (name, _), value in metrics.counters.items()
+                   if name == 'napling_request_mongo_commands_total')
+
+    steps = [
+        ('POST /api/vote (first vote)', 'POST', '/api/vote',
+         {'json': {'category_id': category_id, 'nominee_id': nominee_ids[0]}, 'headers': voter}),
+        ('POST /api/vote (changed vote)', 'POST', '/api/vote',
+         {'json': {'category_id': category_id, 'nominee_id': nominee_ids[1]}, 'headers': voter}),
+        ('GET /api/vote/<category_id>', 'GET', f'/api/vote/{category_id}', {'headers': voter}),
+        ('GET /api/results/<category_id>', 'GET', f'/api/results/{category_id}', {}),
+        ('PUT /api/categories/<category_id>', 'PUT', f'/api/categories/{category_id}',
+         {'json': {'description': 'Renamed'}, 'headers': headers}),
+        ('PUT /api/nominees/<nominee_id>', 'PUT', f'/api/nominees/{nominee_ids[0]}',
+         {'json': {'description': 'Renamed'}, 'headers': headers}),
+        ('DELETE /api/nominees/<nominee_id>/image', 'DELETE', f'/api/nominees/{nominee_ids[1]}/image',
+         {'headers': headers}),
+        ('DELETE /api/nominees/<nominee_id>', 'DELETE', f'/api/nominees/{nominee_ids[2]}', {'headers': headers}),
+    ]
+    results = {}
+    for name, method, url, kwargs in steps:
+        # Every step starts cold, as the first request after a write would
+        app_module.cache.clear()
+        before = commands_so_far()
+        response = client.open(url, method=method, **kwargs)
+        results[name] = {'status': response.status_code, 'commands': int(commands_so_far() - before)}
+    report(args, {'requests': results}, args.output)
+
+
+def add_common_arguments(parser):
+    parser.add_argument('--mongo', default='mongomock',
+                        help='"mongomock" or a local MongoDB URI (default: mongomock)')
+    parser.add_argument('--categories', type=int, default=12)
+    parser.add_argument('--nominees', type=int, default=5, help='Nominees per category')
+    parser.add_argument('--votes', type=int, default=1000000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible runs')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Napling Choice Awards benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    api = subparsers.add_parser('api', help='Mixed vote/results/page-load workload')
+    add_common_arguments(api)
+    api.add_argument('--mix', default='vote=60,results=20,page=20',
+                     help='Operation weights (vote, results, page)')
+    api.add_argument('--warmup', type=float, default=2.0, help='Warmup seconds (not reported)')
+    api.set_defaults(func=bench_api)
+
+    export = subparsers.add_parser('export', help='Streaming vote export throughput')
+    add_common_arguments(export)
+    export.add_argument('--formats', default='ndjson,csv')
+    export.add_argument('--trace-memory', action='store_true',
+                        help='Report peak Python heap during the export (slower)')
+    export.set_defaults(func=bench_export)
+
+    contention = subparsers.add_parser('contention', help='Single-nominee vote throughput by counter shards')
+    add_common_arguments(contention)
+    contention.add_argument('--shards', default='1,8', help='Shard counts to compare')
+    contention.add_argument('--through-api', action='store_true',
+                            help='Vote through POST /api/vote instead of incrementing counters directly')
+    contention.set_defaults(func=bench_contention, threads=32, duration=10.0)
+
+    search = subparsers.add_parser('search', help='Nominee search latency on a large ballot')
+    add_common_arguments(search)
+    search.add_argument('--target-p95-ms', type=float, default=25.0, help='Latency target to check p95 against')
+    search.set_defaults(func=bench_search, categories=20, nominees=500, threads=1, duration=10.0)
+
+    login_burst = subparsers.add_parser('login-burst', help='Vote latency during a burst of admin logins')
+    add_common_arguments(login_burst)
+    login_burst.add_argument('--login-threads', type=int, default=8, help='Threads hammering /api/auth/login')
+    login_burst.set_defaults(func=bench_login_burst, votes=1000, duration=10.0)
+
+    boot = subparsers.add_parser('boot', help='gunicorn boot time and memory with and without preload')
+    boot.add_argument('--mongo', required=True, help='Local MongoDB URI the workers connect to')
+    boot.add_argument('--workers', type=int, default=3)
+    boot.add_argument('--app', default='app:app', help='WSGI app for gunicorn to load')
+    boot.add_argument('--boot-timeout', type=float, default=60.0, help='Seconds to wait for each worker')
+    boot.add_argument('--settle', type=float, default=2.0, help='Seconds to wait before sampling memory')
+    boot.add_argument('--output', help='Also write the JSON report to this file')
+    boot.set_defaults(func=bench_boot)
+
+    faults = subparsers.add_parser('faults', help='Latency and fallbacks while MongoDB is slow')
+    add_common_arguments(faults)
+    faults.add_argument('--latency-ms', type=float, default=3000.0, help='Latency the proxy adds in the slow phase')
+    faults.set_defaults(func=bench_faults, votes=10000, duration=15.0)
+
+    commands = subparsers.add_parser('commands', help='MongoDB commands per request for each read/write handler')
+    add_common_arguments(commands)
+    commands.set_defaults(func=bench_commands, nominees=8, votes=1000)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
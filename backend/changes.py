@@ -0,0 +1,88 @@
+"""
+Change sequence for admin delta sync.
+
+Every category or nominee write stamps the document with a "version" taken
+from a single counter document, and hard deletes leave a tombstone carrying
+the version of the delete. A client that remembers the highest version it has
+seen can ask for everything newer instead of reloading the whole ballot.
+
+A version is allocated before the write that carries it lands, so the counter
+can run ahead of what readers see. changes_since therefore hands back a
+low-water mark (the counter minus a lag) rather than the counter itself:
+clients get some changes twice and must apply them by id, but a write that
+was still in flight is not skipped. Caches keyed on the version (the ballot,
+the search index) ask version_state whether the counter has settled and
+rebuild once more if it had not.
+"""
+import datetime
+
+from pymongo import ReturnDocument
+
+COUNTER_ID = 'change_seq'
+# Longer than any write takes to land after allocating its version
+SETTLE_SECONDS = 10
+
+
+def next_version(db):
+    """Atomically allocate the next change version"""
+    counter = db['counters'].find_one_and_update(
+        {'_id': COUNTER_ID},
+        {'$inc': {'seq': 1}, '$set': {'changed_at': datetime.datetime.now(datetime.UTC)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter['seq']
+
+
+def current_version(db):
+    counter = db['counters'].find_one({'_id': COUNTER_ID})
+    return counter['seq'] if counter else 0
+
+
+def version_state(db):
+    """The current version, and whether the writes that allocated it have surely landed"""
+    counter = db['counters'].find_one({'_id': COUNTER_ID})
+    if not counter:
+        return 0, True
+    changed_at = counter.get('changed_at')
+    if changed_at is None:
+        return counter['seq'], True
+    # pymongo hands back naive UTC datetimes
+    age = datetime.datetime.now(datetime.UTC).replace(tzinfo=None) - changed_at.replace(tzinfo=None)
+    return counter['seq'], age.total_seconds() >= SETTLE_SECONDS
+
+
+def record_deletes(db, kind, ids, version=None):
+    """Leave tombstones for deleted categories or nominees"""
+    ids = list(ids)
+    if not ids:
+        return version
+    if version is None:
+        version = next_version(db)
+    now = datetime.datetime.now(datetime.UTC)
+    db['tombstones'].insert_many([
+        {'kind': kind, 'id': _id, 'version': version, 'deleted_at': now} for _id in ids
+    ])
+    return version
+
+
+def changes_since(db, since, not_deleted, lag=100):
+    """Categories, nominees and tombstones newer than a version
+
+    With since=None everything is returned, as the baseline for later calls.
+    lag is how many versions may be allocated but not yet written.
+    """
+    # Read the counter first so nothing written during the reads is skipped next time
+    version = max(current_version(db) - lag, 0)
+    newer = {} if since is None else {'version': {'$gt': since}}
+    deleted = {'category': [], 'nominee': []}
+    if since is not None:
+        for tombstone in db['tombstones'].find(newer, {'_id': 0, 'kind': 1, 'id': 1}):
+            deleted[tombstone['kind']].append(tombstone['id'])
+    return {
+        'version': version,
+        'categories': list(db['categories'].find({**newer, **not_deleted}, {'_id': 0})),
+        'nominees': list(db['nominees'].find({**newer, **not_deleted}, {'_id': 0})),
+        'deleted_categories': deleted['category'],
+        'deleted_nominees': deleted['nominee']
+    }
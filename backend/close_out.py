@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Event close-out: freeze final results and move votes to cold storage.
+
+For each category this
+  1. locks voting,
+  2. computes the final standings and stores them as an immutable document in
+     results_snapshots (one per category, enforced by a unique index),
+  3. streams the raw votes into a gzip-compressed NDJSON archive, either a
+     local file or an S3 object,
+  4. deletes the archived votes from the hot votes collection in batches.
+
+/api/results/<category_id> serves frozen categories from the snapshot.
+
+    python close_out.py --all --archive s3
+    python close_out.py --category-id <id> --archive file --archive-dir archives
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import tempfile
+import time
+
+from pymongo.errors import DuplicateKeyError
+
+import vote_archive
+from changes import next_version
+from vote_keys import id_match
+from jobs import delete_in_batches
+
+# How often a long archive step refreshes its job's lease (jobs.py leases are 60 s)
+PROGRESS_SECONDS = 10
+
+
+def compute_standings(db, category_id):
+    """Final vote counts per nominee, highest first, with nominee details"""
+    pipeline = [
+        {'$match': {'category_id': id_match(category_id)}},
+        {'$group': {
+            '_id': {'$toString': '$nominee_id'},
+            'vote_count': {'$sum': 1}
+        }},
+        {'$sort': {'vote_count': -1}}
+    ]
+    results = list(db['votes'].aggregate(pipeline))
+    details = {
+        nominee['id']: nominee
+        for nominee in db['nominees'].find({'id': {'$in': [r['_id'] for r in results]}}, {'_id': 0})
+    }
+    for result in results:
+        result['nominee'] = details.get(result['_id'])
+        result['nominee_id'] = result['_id']
+        del result['_id']
+    return results
+
+
+def freeze_results(db, category):
+    """Store the final standings once; later calls return the existing snapshot"""
+    snapshots = db['results_snapshots']
+    existing = snapshots.find_one({'category_id': category['id']})
+    if existing:
+        return existing
+
+    results = compute_standings(db, category['id'])
+    snapshot = {
+        'category_id': category['id'],
+        'category_name': category.get('name', ''),
+        'results': results,
+        'total_votes': sum(r['vote_count'] for r in results),
+        'frozen_at': datetime.datetime.now(datetime.UTC)
+    }
+    try:
+        snapshots.insert_one(snapshot)
+    except DuplicateKeyError:
+        return snapshots.find_one({'category_id': category['id']})
+    return snapshot
+
+
+def archive_votes(db, category_id, archive, archive_dir='archives', s3_client=None,
+                  s3_bucket=None, s3_prefix='', batch_size=5000, on_progress=None):
+    """Write a category's votes to a gzip NDJSON archive and describe it
+
+    on_progress(**fields) is called every PROGRESS_SECONDS while votes are
+    written and uploaded, so a job running this keeps its lease.
+    """
+    # Remember the newest vote included so the delete never touches anything newer
+    newest = db['votes'].find_one({'category_id': id_match(category_id)}, {'_id': 1}, sort=[('_id', -1)])
+    if newest is None:
+        return None
+    query = {'category_id': id_match(category_id), '_id': {'$lte': newest['_id']}}
+    timestamp = datetime.datetime.now(datetime.UTC).strftime('%Y%m%d_%H%M%S')
+    filename = f"votes-{category_id}-{timestamp}.ndjson.gz"
+
+    counted = {'votes': 0}
+    last_progress = [time.monotonic()]
+
+    def heartbeat(**fields):
+        if on_progress and time.monotonic() - last_progress[0] >= PROGRESS_SECONDS:
+            last_progress[0] = time.monotonic()
+            on_progress(**fields)
+
+    def counted_cursor():
+        for doc in db['votes'].find(query, batch_size=batch_size).sort('_id', 1):
+            counted['votes'] += 1
+            heartbeat(votes_written=counted['votes'])
+            yield doc
+
+    if archive == 's3':
+        handle = tempfile.NamedTemporaryFile(suffix='.ndjson.gz', delete=False)
+        path = handle.name
+    else:
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, filename)
+        handle = open(path, 'wb')
+
+    digest = hashlib.sha256()
+    size = 0
+    with handle:
+        for chunk in vote_archive.gzip_stream(vote_archive.iter_ndjson(counted_cursor())):
+            handle.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+
+    location = os.path.abspath(path)
+    if archive == 's3':
+        key = os.path.join(s3_prefix or '', 'archives', filename)
+        try:
+            s3_client.upload_file(path, s3_bucket, key, ExtraArgs={'ContentType': 'application/gzip'},
+                                  Callback=lambda transferred: heartbeat())
+        finally:
+            os.remove(path)
+        location = f"s3://{s3_bucket}/{key}"
+
+    return {
+        'location': location,
+        'votes': counted['votes'],
+        'bytes': size,
+        'sha256': digest.hexdigest(),
+        'max_vote_id': newest['_id'],
+        'archived_at': datetime.datetime.now(datetime.UTC)
+    }
+
+
+def close_out_category(db, category, archive='file', delete_batch_size=1000,
+                       delete_pause=0.1, on_progress=None, **archive_options):
+    """Freeze, archive and purge one category; safe to run again
+
+    on_progress(inc=None, **fields) is called as each step finishes.
+    """
+    categories = db['categories']
+    categories.update_one({'id': category['id']}, {'$set': {'voting_locked': True, 'version': next_version(db)}})
+
+    snapshot = freeze_results(db, category)
+    categories.update_one({'id': category['id']}, {'$set': {'results_frozen': True, 'version': next_version(db)}})
+    if on_progress:
+        on_progress(frozen=True, total_votes=snapshot['total_votes'])
+
+    archived = archive_votes(db, category['id'], archive, on_progress=on_progress, **archive_options)
+    if archived is None:
+        return {'category_id': category['id'], 'total_votes': snapshot['total_votes'],
+                'archive': None, 'votes_deleted': 0}
+
+    # Each run appends its archive; reruns only pick up votes left behind
+    categories.update_one({'id': category['id']}, {
+        '$push': {'vote_archives': archived},
+        '$set': {'version': next_version(db)}
+    })
+    if on_progress:
+        on_progress(archive=archived['location'], votes_archived=archived['votes'])
+
+    deleted = delete_in_batches(
+        db['votes'],
+        {'category_id': id_match(category['id']), '_id': {'$lte': archived['max_vote_id']}},
+        delete_batch_size,
+        delete_pause,
+        on_batch=(lambda count: on_progress(inc={'votes_deleted': count})) if on_progress else None
+    )
+    return {
+        'category_id': category['id'],
+        'total_votes': snapshot['total_votes'],
+        'archive': archived['location'],
+        'votes_archived': archived['votes'],
+        'votes_deleted': deleted
+    }
+
+
+def main():
+    import boto3
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Freeze results and archive votes')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--category-id', action='append', help='Category to close (repeatable)')
+    target.add_argument('--all', action='store_true', help='Close every category')
+    parser.add_argument('--archive', choices=['file', 's3'], default='file')
+    parser.add_argument('--archive-dir', default='archives')
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('DELETE_BATCH_SIZE', '1000')))
+    args = parser.parse_args()
+
+    # MongoDB connection
+    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    db = client['napling_choice_awards']
+    db['results_snapshots'].create_index([('category_id', 1)], unique=True)
+
+    query = {'deleted': {'$ne': True}}
+    if not args.all:
+        query['id'] = {'$in': args.category_id}
+
+    options = {'archive_dir': args.archive_dir}
+    if args.archive == 's3':
+        options.update({
+            's3_client': boto3.client(
+                's3',
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                region_name=os.getenv('AWS_REGION', 'us-east-1')
+            ),
+            's3_bucket': os.getenv('S3_BUCKET_NAME'),
+            's3_prefix': os.getenv('S3_BUCKET_PATH', '')
+        })
+
+    for category in db['categories'].find(query):
+        summary = close_out_category(db, category, archive=args.archive,
+                                     delete_batch_size=args.batch_size, **options)
+        print(f"Closed {category['name']}: {summary}")
+
+
+if __name__ == '__main__':
+    main()
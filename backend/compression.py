@@ -0,0 +1,97 @@
+"""
+Compressed JSON responses with the encoded bodies kept in the cache.
+
+A cached_json view is serialized and compressed once per cache fill; the
+identity and gzip bodies are stored together, so a cache hit only picks the
+variant the client accepts. Each variant has its own ETag (the gzip one ends
+in -gzip), since they are different bytes. Compression time and bytes saved
+are reported per endpoint at /api/metrics.
+"""
+import functools
+import gzip
+import hashlib
+import time
+
+from flask import Response, current_app, request
+
+import resilience
+from instrumentation import metrics
+
+# Smaller bodies are not worth the Content-Encoding overhead
+MIN_COMPRESS_BYTES = 512
+GZIP_LEVEL = 6
+
+metrics.describe('napling_compression_duration_seconds', 'histogram', 'Time spent compressing cached JSON bodies')
+metrics.describe('napling_compression_bytes_saved_total', 'counter', 'Response bytes saved by compressed variants')
+
+ENCODERS = [('gzip', lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))]
+
+
+def encode(body, endpoint):
+    """Identity body plus every compressed variant that is smaller"""
+    entry = {'identity': body, 'etag': hashlib.sha1(body).hexdigest(), 'variants': []}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return entry
+    for encoding, compress in ENCODERS:
+        start = time.perf_counter()
+        compressed = compress(body)
+        metrics.observe('napling_compression_duration_seconds', time.perf_counter() - start,
+                        {'endpoint': endpoint, 'encoding': encoding})
+        if len(compressed) < len(body):
+            entry['variants'].append((encoding, compressed))
+    return entry
+
+
+def respond(entry, endpoint, headers=None):
+    """Serve the best variant the request accepts, or 304 for a matching ETag"""
+    headers = dict(headers or {})
+    if entry['variants']:
+        headers['Vary'] = 'Accept-Encoding'
+    encoding, body = next(((encoding, body) for encoding, body in entry['variants']
+                           if request.accept_encodings.quality(encoding) > 0), (None, entry['identity']))
+    etag = f"{entry['etag']}-{encoding}" if encoding else entry['etag']
+    headers['ETag'] = f'"{etag}"'
+    # Proxies that recompress turn ETags weak, which is still a match for a GET
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        metrics.inc('napling_compression_bytes_saved_total', {'endpoint': endpoint, 'encoding': encoding},
+                    len(entry['identity']) - len(body))
+    return Response(body, mimetype='application/json', headers=headers)
+
+
+def cached_json(cache, timeout, query_string=False):
+    """Like cache.cached, but caches the encoded bodies of a JSON view
+
+    Only successful results (a dict or list) are cached; tuples such as
+    ({'error': ...}, 404) pass straight through. Keys use the same view/<path>
+    form as Flask-Caching, so cache.clear() and the cache metrics cover them.
+    Entries outlive their timeout by resilience.STALE_SECONDS so that the last
+    good response can still be served while MongoDB is unavailable.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = f"view{request.path}"
+            if query_string:
+                key += hashlib.md5(
+                    '&'.join(sorted(f'{k}={v}' for k, v in request.args.items(multi=True))).encode()
+                ).hexdigest()
+            endpoint = request.url_rule.rule
+            entry = cache.get(key)
+            if entry is not None and time.time() < entry['fresh_until']:
+                return respond(entry, endpoint)
+
+            rv, stale = resilience.outage_fallback(lambda: view(*args, **kwargs), entry)
+            if stale:
+                return respond(entry, endpoint, {'Warning': '110 - "Response is Stale"'})
+            if not isinstance(rv, (dict, list)):
+                return rv
+            entry = encode(current_app.json.dumps(rv).encode('utf-8'), endpoint)
+            entry['fresh_until'] = time.time() + timeout
+            cache.set(key, entry, timeout=timeout + resilience.STALE_SECONDS)
+            return respond(entry, endpoint)
+        return resilience.handles_outage(wrapper)
+    return decorator
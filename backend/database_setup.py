@@ -1,7 +1,9 @@
 from pymongo import MongoClient
+from bson import ObjectId
 import datetime
 import os
 from dotenv import load_dotenv
+import vote_keys
 
 load_dotenv()
 
@@ -14,6 +16,12 @@ categories = db['categories']
 nominees = db['nominees']
 votes = db['votes']
 admin_users = db['admin_users']
+vote_flags = db['vote_flags']
+jobs = db['jobs']
+results_snapshots = db['results_snapshots']
+tombstones = db['tombstones']
+vote_rollups = db['vote_rollups']
+vote_counters = db['vote_counters']
 
 def setup_database():
     """Initialize the database with sample data"""
@@ -22,6 +30,8 @@ def setup_database():
     categories.delete_many({})
     nominees.delete_many({})
     votes.delete_many({})
+    vote_rollups.delete_many({})
+    vote_counters.delete_many({})
     admin_users.delete_many({})
 
     # Create sample categories
@@ -88,19 +98,15 @@ def setup_database():
         }
     ]
 
-    # Insert categories
+    # Insert categories in one round-trip, with the id field set up front
     category_ids = []
     for category in sample_categories:
-        result = categories.insert_one(category)
-        category_id = str(result.inserted_id)
-        # Update the document to include the id field
-        categories.update_one(
-            {'_id': result.inserted_id},
-            {'$set': {'id': category_id}}
-        )
-        category_ids.append(category_id)
-        print(f"Created category: {category['name']} with ID: {category_id}")
-        # print(categories.find_one({'_id': result.inserted_id}))
+        category['_id'] = ObjectId()
+        category['id'] = str(category['_id'])
+        category_ids.append(category['id'])
+    categories.insert_many(sample_categories)
+    for category in sample_categories:
+        print(f"Created category: {category['name']} with ID: {category['id']}")
 
     # Create sample nominees
     sample_nominees = [
@@ -310,22 +316,28 @@ def setup_database():
         }
     ]
 
-    # Insert nominees
+    # Insert nominees in one round-trip, with the id field set up front
+    for nominee in sample_nominees:
+        nominee['_id'] = ObjectId()
+        nominee['id'] = str(nominee['_id'])
+    nominees.insert_many(sample_nominees)
     for nominee in sample_nominees:
-        result = nominees.insert_one(nominee)
-        nominee_id = str(result.inserted_id)
-        # Update the document to include the id field
-        nominees.update_one(
-            {'_id': result.inserted_id},
-            {'$set': {'id': nominee_id}}
-        )
-        print(f"Created nominee: {nominee['name']} with ID: {nominee_id}")
-        print(nominees.find_one({'_id': result.inserted_id}))
+        print(f"Created nominee: {nominee['name']} with ID: {nominee['id']}")
 
     # Create indexes for better performance
-    votes.create_index([("category_id", 1), ("voter_ip", 1)], unique=True)
-    nominees.create_index([("category_id", 1)])
+    vote_keys.ensure_indexes(votes)
+    # Serves category filters and keyset pages sorted on _id
+    nominees.create_index([("category_id", 1), ("_id", 1)])
     categories.create_index([("name", 1)], unique=True)
+    vote_flags.create_index([("created_at", -1)])
+    jobs.create_index([("status", 1), ("created_at", 1)])
+    jobs.create_index([("id", 1)], unique=True)
+    results_snapshots.create_index([("category_id", 1)], unique=True)
+    categories.create_index([("version", 1)])
+    nominees.create_index([("version", 1)])
+    tombstones.create_index([("version", 1)])
+    vote_rollups.create_index([("category_id", 1), ("granularity", 1), ("bucket", 1), ("nominee_id", 1)], unique=True)
+    vote_counters.create_index([("category_id", 1), ("nominee_id", 1), ("shard", 1)], unique=True)
 
     print("\nDatabase setup completed successfully!")
     print(f"Created {len(category_ids)} award categories and {len(sample_nominees)} nominees")
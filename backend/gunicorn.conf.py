@@ -0,0 +1,53 @@
+"""
+Gunicorn settings for production (deployment/gunicorn.service runs
+`gunicorn -c gunicorn.conf.py app:app`).
+
+With preload the master imports app.py once and forks the workers from it,
+so the route table, the static build index and other import-time data are
+shared copy-on-write instead of being built in every worker. The clients
+that must not cross a fork (MongoDB, boto3) and the background threads are
+recreated in each worker by app.reinit_after_fork().
+
+Every setting can be overridden from the environment (.env is read by the
+systemd unit): GUNICORN_WORKERS, GUNICORN_PRELOAD, GUNICORN_BIND,
+GUNICORN_MAX_REQUESTS, GUNICORN_MAX_REQUESTS_JITTER, GUNICORN_TIMEOUT.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+bind = os.getenv('GUNICORN_BIND', 'unix:napling-choice-awards.sock')
+umask = 0o007
+# Sync workers spend most of their time on CPU (JSON, hashing) between short MongoDB calls
+workers = int(os.getenv('GUNICORN_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+# Recycle workers now and then to cap slow leaks; the jitter keeps them from restarting together
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+if preload_app:
+    # Tells app.py to leave its background threads to the workers
+    os.environ['NAPLING_PRELOAD'] = '1'
+
+
+def when_ready(server):
+    """Runs in the master once the app is loaded, before the first fork"""
+    app_module = sys.modules.get('app')
+    if app_module is None:
+        return
+    # The master never serves requests; drop its MongoDB connections and monitor threads
+    app_module.client.close()
+    # Keep the collector from touching (and so copying) the preloaded objects in every worker
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        sys.modules['app'].reinit_after_fork()
+
+
+def post_worker_init(worker):
+    worker.log.info(f"Worker ready (pid: {worker.pid})")
@@ -0,0 +1,308 @@
+"""
+Request and hot-path instrumentation.
+
+Collects per-endpoint latency histograms, MongoDB command counts and
+durations (through PyMongo command monitoring), the MongoDB commands each
+endpoint issues, cache hits and misses per key prefix and S3 call timings,
+and renders them in the Prometheus text format.
+
+Every gunicorn worker keeps its own registry, so a scrape reports the worker
+that happened to serve it.
+
+Setting PROFILE_SLOW_REQUEST_MS turns on a sampling profiler that writes
+folded stacks (flamegraph.pl / speedscope format) for requests slower than the
+threshold into PROFILE_DIR.
+"""
+import collections
+import datetime
+import os
+import re
+import sys
+import threading
+import time
+
+from flask import g, has_request_context, request
+from pymongo import monitoring
+
+# Prometheus default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+class Metrics:
+    """Minimal thread-safe Prometheus registry (counters and histograms)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.help = {}
+        self.counters = collections.defaultdict(float)
+        # (name, labels) -> [bucket counts..., sum, count]
+        self.histograms = {}
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            self.counters[key] += value
+
+    def observe(self, name, seconds, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            state = self.histograms.get(key)
+            if state is None:
+                state = self.histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    state[i] += 1
+            state[-2] += seconds
+            state[-1] += 1
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(state)) for key, state in self.histograms.items())
+
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described and name in self.help:
+                kind, text = self.help[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{format_labels(labels)} {value:g}")
+
+        for (name, labels), state in histograms:
+            header(name)
+            for bound, count in zip(self.buckets, state):
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {count}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {state[-1]}")
+            lines.append(f"{name}_sum{format_labels(labels)} {state[-2]:.6f}")
+            lines.append(f"{name}_count{format_labels(labels)} {state[-1]}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+metrics = Metrics()
+metrics.describe('napling_http_request_duration_seconds', 'histogram', 'Request latency by endpoint')
+metrics.describe('napling_mongo_command_duration_seconds', 'histogram', 'MongoDB command latency')
+metrics.describe('napling_mongo_command_failures_total', 'counter', 'Failed MongoDB commands')
+metrics.describe('napling_request_mongo_commands_total', 'counter',
+                 'MongoDB commands issued by requests, by endpoint (divide by the request count for a per-request figure)')
+metrics.describe('napling_cache_requests_total', 'counter', 'Cache lookups by key prefix and result')
+metrics.describe('napling_s3_call_duration_seconds', 'histogram', 'S3 API call latency')
+metrics.describe('napling_s3_call_failures_total', 'counter', 'Failed S3 API calls')
+
+
+def count_request_command():
+    """Charge one MongoDB command to the request being served, if any"""
+    # Command monitoring calls back on the thread that sent the command
+    if has_request_context():
+        g.mongo_commands = g.get('mongo_commands', 0) + 1
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Records the count and duration of every MongoDB command"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ''
+        count_request_command()
+
+    def _labels(self, event):
+        return {
+            'command': event.command_name,
+            'collection': self._collections.pop(event.request_id, '')
+        }
+
+    def succeeded(self, event):
+        metrics.observe('napling_mongo_command_duration_seconds',
+                        event.duration_micros / 1e6, self._labels(event))
+
+    def failed(self, event):
+        labels = self._labels(event)
+        metrics.observe('napling_mongo_command_duration_seconds', event.duration_micros / 1e6, labels)
+        metrics.inc('napling_mongo_command_failures_total', labels)
+
+
+def cache_key_prefix(key):
+    """Reduce a cache key to a label with a bounded set of values
+
+    View keys become the route rule, e.g. /api/results/<category_id>, so
+    every category shares one label; outside a request only the static
+    /api/<resource> part is kept. Other keys (e.g. ballot) are fixed names.
+    """
+    if not key.startswith('view/'):
+        return key
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    # query_string=True keys append a 32 character md5 digest to the path
+    path = re.sub(r'[0-9a-f]{32}$', '', key[len('view'):])
+    return '/'.join(path.split('/')[:3])
+
+
+def instrument_cache(cache):
+    """Count hits and misses on the cache backend behind a flask_caching.Cache"""
+    backend = cache.cache
+    original_get = backend.get
+
+    def get(key):
+        value = original_get(key)
+        metrics.inc('napling_cache_requests_total', {
+            'prefix': cache_key_prefix(key),
+            'result': 'miss' if value is None else 'hit'
+        })
+        return value
+
+    backend.get = get
+
+
+def instrument_s3(s3_client):
+    """Time every S3 API call made through a boto3 client"""
+    events = s3_client.meta.events
+
+    def before_call(context, **kwargs):
+        context['napling_started'] = time.perf_counter()
+
+    def after_call(model, context, **kwargs):
+        started = context.pop('napling_started', None)
+        if started is not None:
+            metrics.observe('napling_s3_call_duration_seconds',
+                            time.perf_counter() - started, {'operation': model.name})
+
+    def after_call_error(context, **kwargs):
+        started = context.pop('napling_started', None)
+        if started is not None:
+            metrics.inc('napling_s3_call_failures_total')
+
+    events.register('before-call.s3', before_call)
+    events.register('after-call.s3', after_call)
+    events.register('after-call-error.s3', after_call_error)
+
+
+class SamplingProfiler:
+    """Samples the stacks of in-flight request threads at a fixed interval"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.active = {}
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def begin(self):
+        with self.lock:
+            self.active[threading.get_ident()] = collections.Counter()
+
+    def end(self):
+        with self.lock:
+            return self.active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[fold_stack(frame)] += 1
+
+
+def fold_stack(frame):
+    """Render a frame as a root-to-leaf folded stack line"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+# Set by init_app when slow-request profiling is on
+profiler = None
+
+
+def init_app(app, cache=None, s3_client=None):
+    """Install the request hooks and instrument the cache and S3 client"""
+    global profiler
+    if cache is not None:
+        instrument_cache(cache)
+    if s3_client is not None:
+        instrument_s3(s3_client)
+
+    slow_ms = float(os.getenv('PROFILE_SLOW_REQUEST_MS', '0'))
+    profile_dir = os.getenv('PROFILE_DIR', 'profiles')
+    if slow_ms > 0:
+        profiler = SamplingProfiler(float(os.getenv('PROFILE_INTERVAL_MS', '5')) / 1000)
+        profiler.start()
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        if profiler is not None:
+            profiler.begin()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('napling_http_request_duration_seconds', elapsed, {
+            'method': request.method,
+            'endpoint': endpoint,
+            'status': str(response.status_code)
+        })
+        # Commands a streamed body sends after this point are not counted
+        metrics.inc('napling_request_mongo_commands_total', {
+            'method': request.method,
+            'endpoint': endpoint
+        }, g.pop('mongo_commands', 0))
+
+        if profiler is not None:
+            stacks = profiler.end()
+            if stacks and elapsed * 1000 >= slow_ms:
+                dump_stacks(profile_dir, request.method, endpoint, elapsed, stacks)
+        return response
+
+
+def dump_stacks(profile_dir, method, endpoint, elapsed, stacks):
+    """Write folded stacks for one slow request"""
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        timestamp = datetime.datetime.now(datetime.UTC).strftime('%Y%m%d_%H%M%S_%f')
+        name = re.sub(r'[^A-Za-z0-9]+', '_', f"{method}_{endpoint}").strip('_')
+        path = os.path.join(profile_dir, f"{timestamp}_{name}_{int(elapsed * 1000)}ms.folded")
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+    except OSError as e:
+        print(f"Error writing profile: {str(e)}")
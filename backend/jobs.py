@@ -0,0 +1,169 @@
+"""
+Background jobs stored in MongoDB.
+
+Request handlers enqueue a job document and return straight away. Every app
+process runs a JobRunner thread that claims pending jobs with an atomic
+find_one_and_update, so each job runs in exactly one worker at a time. A
+running job refreshes its heartbeat as it reports progress; if the worker
+dies, the job is reclaimed once the lease expires, so handlers must be safe
+to run again from the start.
+
+A job that raises is retried with exponential backoff (retry_delay, doubled
+per attempt, at most an hour) until it has run max_attempts times; after
+that it stays failed until an admin retries it (JobRunner.retry).
+"""
+import datetime
+import os
+import socket
+import threading
+import time
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+
+class JobRunner:
+    """Claims and runs queued jobs on a daemon thread"""
+
+    def __init__(self, jobs_collection, poll_interval=2.0, lease_seconds=60, max_attempts=5, retry_delay=30.0):
+        self.jobs = jobs_collection
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.handlers = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._thread = None
+
+    def register(self, job_type, handler):
+        """Register handler(job, runner) for a job type"""
+        self.handlers[job_type] = handler
+
+    def enqueue(self, job_type, params):
+        """Insert a pending job and wake the local runner"""
+        _id = ObjectId()
+        job = {
+            '_id': _id,
+            'id': str(_id),
+            'type': job_type,
+            'params': params,
+            'status': 'pending',
+            'progress': {},
+            'attempts': 0,
+            'created_at': datetime.datetime.now(datetime.UTC)
+        }
+        self.jobs.insert_one(job)
+        self._wake.set()
+        return job
+
+    def progress(self, job, inc=None, **fields):
+        """Record progress for a running job and extend its lease"""
+        update = {'$set': {'heartbeat_at': datetime.datetime.now(datetime.UTC)}}
+        for key, value in fields.items():
+            update['$set'][f'progress.{key}'] = value
+        if inc:
+            update['$inc'] = {f'progress.{key}': value for key, value in inc.items()}
+        self.jobs.update_one({'_id': job['_id']}, update)
+
+    def retry(self, job_id):
+        """Requeue a failed job now, with a fresh set of attempts; None if no such failed job"""
+        job = self.jobs.find_one_and_update(
+            {'id': job_id, 'status': 'failed'},
+            {'$set': {'status': 'pending', 'attempts': 0}, '$unset': {'run_after': '', 'finished_at': ''}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            self._wake.set()
+        return job
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+            self._thread = threading.Thread(target=self._run, name='job-runner', daemon=True)
+            self._thread.start()
+
+    def _claim(self):
+        now = datetime.datetime.now(datetime.UTC)
+        stale = now - datetime.timedelta(seconds=self.lease_seconds)
+        return self.jobs.find_one_and_update(
+            {
+                'type': {'$in': list(self.handlers)},
+                '$or': [
+                    # $not/$gt also matches jobs without run_after
+                    {'status': 'pending', 'run_after': {'$not': {'$gt': now}}},
+                    {'status': 'running', 'heartbeat_at': {'$lt': stale}}
+                ]
+            },
+            {
+                '$set': {
+                    'status': 'running',
+                    'worker': self.worker_id,
+                    'started_at': now,
+                    'heartbeat_at': now
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _run(self):
+        while True:
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"Error claiming job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            try:
+                result = self.handlers[job['type']](job, self)
+            except Exception as e:
+                self._failed(job, e)
+            else:
+                self._finish(job, {
+                    'status': 'completed',
+                    'result': result,
+                    'finished_at': datetime.datetime.now(datetime.UTC)
+                })
+
+    def _failed(self, job, error):
+        now = datetime.datetime.now(datetime.UTC)
+        if job.get('attempts', 1) < self.max_attempts:
+            delay = min(self.retry_delay * 2 ** (job.get('attempts', 1) - 1), 3600)
+            print(f"Job {job['id']} ({job['type']}) failed, retrying in {delay:.0f}s: {str(error)}")
+            self._finish(job, {
+                'status': 'pending',
+                'error': str(error),
+                'run_after': now + datetime.timedelta(seconds=delay)
+            })
+        else:
+            print(f"Job {job['id']} ({job['type']}) failed: {str(error)}")
+            self._finish(job, {'status': 'failed', 'error': str(error), 'finished_at': now})
+
+    def _finish(self, job, fields):
+        # A status write that fails (MongoDB down) must not kill the runner thread;
+        # the job stays running and is reclaimed once its lease expires
+        try:
+            self.jobs.update_one({'_id': job['_id']}, {'$set': fields})
+        except Exception as e:
+            print(f"Error recording status of job {job['id']}: {str(e)}")
+
+
+def delete_in_batches(collection, query, batch_size, pause, on_batch=None):
+    """Delete matching documents in bounded batches, pausing between them"""
+    deleted = 0
+    while True:
+        ids = [doc['_id'] for doc in collection.find(query, {'_id': 1}).limit(batch_size)]
+        if not ids:
+            return deleted
+        result = collection.delete_many({'_id': {'$in': ids}})
+        deleted += result.deleted_count
+        if on_batch:
+            on_batch(result.deleted_count)
+        time.sleep(pause)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Convert votes to the compact schema (see vote_keys.py).
+
+Swaps the unique indexes so both schemas can coexist, then rewrites legacy
+votes in batches: string ids become ObjectIds and voter_ip is replaced by
+keyed hashes of the address and of its network. Collection and index sizes
+are printed before and after. Run it before deploying code that writes the
+new schema, and again afterwards to pick up any votes written in between; it
+is safe to rerun. Once no legacy
+votes remain it drops the legacy index, which tells the API to stop matching
+the legacy form (within vote_keys.LEGACY_CHECK_SECONDS).
+
+    python migrate_votes.py
+    python migrate_votes.py --batch-size 2000 --dry-run
+
+WiredTiger keeps freed space for reuse, so storageSize only drops after a
+`compact` on the collection; size, avgObjSize and index sizes drop at once.
+"""
+import argparse
+import datetime
+import os
+import time
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import vote_keys
+
+LEGACY = {'voter_ip': {'$exists': True}}
+
+
+def storage_stats(db):
+    stats = db.command('collStats', 'votes')
+    return {
+        'count': stats.get('count', 0),
+        'size': stats.get('size', 0),
+        'avgObjSize': stats.get('avgObjSize', 0),
+        'storageSize': stats.get('storageSize', 0),
+        'totalIndexSize': stats.get('totalIndexSize', 0),
+        'indexSizes': stats.get('indexSizes', {})
+    }
+
+
+def print_stats(label, stats):
+    print(f"{label}: {stats['count']} votes, size {stats['size']} bytes "
+          f"(avg {stats['avgObjSize']}), storage {stats['storageSize']} bytes, "
+          f"indexes {stats['totalIndexSize']} bytes")
+    for name, size in stats['indexSizes'].items():
+        print(f"  {name}: {size} bytes")
+
+
+def resolve_duplicate(votes, doc, update):
+    """A voter has both a legacy and a converted vote; keep the newer one"""
+    existing = votes.find_one({'category_id': update['category_id'], 'voter_key': update['voter_key']})
+    created_at = lambda vote: vote.get('created_at') or datetime.datetime.min
+    if existing and created_at(existing) >= created_at(doc):
+        votes.delete_one({'_id': doc['_id']})
+    else:
+        if existing:
+            votes.delete_one({'_id': existing['_id']})
+        votes.update_one({'_id': doc['_id']}, {'$set': update, '$unset': {'voter_ip': ''}})
+
+
+def migrate(db, batch_size=1000, pause=0.1):
+    """Convert legacy votes batch by batch; returns how many were converted"""
+    votes = db['votes']
+    secret = vote_keys.hash_secret()
+    converted = 0
+    while True:
+        batch = list(votes.find(LEGACY, {'category_id': 1, 'nominee_id': 1, 'voter_ip': 1, 'created_at': 1})
+                     .limit(batch_size))
+        if not batch:
+            return converted
+
+        updates = {doc['_id']: vote_keys.compact_vote(doc, secret) for doc in batch}
+        ids = list(updates)
+        operations = [
+            UpdateOne({'_id': _id, **LEGACY}, {'$set': updates[_id], '$unset': {'voter_ip': ''}})
+            for _id in ids
+        ]
+        try:
+            result = votes.bulk_write(operations, ordered=False)
+            converted += result.modified_count
+        except BulkWriteError as e:
+            converted += e.details.get('nModified', 0)
+            by_id = {doc['_id']: doc for doc in batch}
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') != 11000:
+                    raise
+                _id = ids[error['index']]
+                resolve_duplicate(votes, by_id[_id], updates[_id])
+                converted += 1
+        print(f"Converted {converted} votes")
+        time.sleep(pause)
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Convert votes to the compact schema')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--pause-ms', type=float, default=100, help='Pause between batches')
+    parser.add_argument('--dry-run', action='store_true', help='Only report sizes and legacy votes')
+    args = parser.parse_args()
+
+    # MongoDB connection
+    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    db = client['napling_choice_awards']
+    votes = db['votes']
+
+    before = storage_stats(db)
+    print_stats('Before', before)
+    print(f"Legacy votes: {votes.count_documents(LEGACY)}")
+    if args.dry_run:
+        return
+
+    vote_keys.ensure_indexes(votes)
+    converted = migrate(db, args.batch_size, args.pause_ms / 1000)
+
+    if votes.find_one(LEGACY, {'_id': 1}) is None:
+        if vote_keys.LEGACY_INDEX in votes.index_information():
+            votes.drop_index(vote_keys.LEGACY_INDEX)
+            print(f"Dropped {vote_keys.LEGACY_INDEX}")
+
+    after = storage_stats(db)
+    print_stats('After', after)
+    if before['count']:
+        print(f"Converted {converted} votes; data {before['size'] - after['size']} bytes smaller, "
+              f"indexes {before['totalIndexSize'] - after['totalIndexSize']} bytes smaller")
+
+
+if __name__ == '__main__':
+    main()
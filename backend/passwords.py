@@ -0,0 +1,93 @@
+"""
+Password hashing with a host-wide cap on how much of it runs at once.
+
+Hashes are deliberately slow (100-300 ms of CPU each), so a burst of login
+attempts could otherwise hold every gunicorn worker's CPU and stall voting.
+A hash runs inline on the request thread, but only while it holds one of
+PASSWORD_HASH_SLOTS lock files shared by every worker on the host; a request
+that finds them all taken fails fast with PasswordHashBusy (503) instead of
+queueing. flock locks belong to the open file, so the cap also holds between
+threads of one worker.
+
+This bounds how many hashes run at once, not how long one takes: a hash that
+has started always runs to completion.
+
+PASSWORD_HASH_METHOD takes any werkzeug method string (scrypt,
+pbkdf2:sha256:600000, ...). Stored hashes made with other parameters are
+replaced on the next successful login.
+"""
+import contextlib
+import os
+import tempfile
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+# Hashes allowed to run at the same time per host
+HASH_SLOTS = int(os.getenv('PASSWORD_HASH_SLOTS', '1'))
+HASH_LOCK_DIR = os.getenv('PASSWORD_HASH_LOCK_DIR') or tempfile.gettempdir()
+
+
+class PasswordHashBusy(Exception):
+    """Every hashing slot is taken; the caller should answer 503"""
+
+
+_method_prefix = None
+
+
+@contextlib.contextmanager
+def host_slot():
+    """Hold one of the host-wide hashing slots, or raise PasswordHashBusy"""
+    if fcntl is None or HASH_SLOTS <= 0:
+        yield
+        return
+    for slot in range(HASH_SLOTS):
+        f = open(os.path.join(HASH_LOCK_DIR, f'napling-password-hash-{slot}.lock'), 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            continue
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+        return
+    raise PasswordHashBusy()
+
+
+def run(function, *args):
+    """Run a hashing function while holding a host slot"""
+    with host_slot():
+        return function(*args)
+
+
+def method_prefix():
+    """The method$ prefix HASH_METHOD produces, with werkzeug's defaults filled in"""
+    global _method_prefix
+    if _method_prefix is None:
+        _method_prefix = generate_password_hash('', HASH_METHOD).split('$', 1)[0]
+    return _method_prefix
+
+
+def _verify(stored_hash, password):
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    if stored_hash.split('$', 1)[0] == method_prefix():
+        return True, None
+    return True, generate_password_hash(password, HASH_METHOD)
+
+
+def verify(stored_hash, password):
+    """(matches, new_hash): new_hash is set when the stored one uses old parameters"""
+    return run(_verify, stored_hash, password)
+
+
+def hash_password(password):
+    return run(generate_password_hash, password, HASH_METHOD)
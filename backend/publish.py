@@ -0,0 +1,91 @@
+"""
+Publish final results as static JSON objects in S3.
+
+Once a category's voting is locked its results never change, so they are
+rendered once into content-addressed, gzip-encoded objects with an immutable
+Cache-Control header. The object URLs are stored on the category document
+(the "published" field) and the frontend reads results straight from S3 or
+the CDN in front of it instead of going through the API.
+"""
+import datetime
+import gzip
+import hashlib
+import json
+import os
+
+from ballot import PUBLIC_NOMINEE_FIELDS
+from changes import next_version
+from close_out import compute_standings
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def json_default(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.UTC)
+        return value.isoformat()
+    return str(value)
+
+
+def render(document):
+    return json.dumps(document, default=json_default, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def put_immutable(s3_client, bucket, key, body):
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=gzip.compress(body, mtime=0),
+        ContentType='application/json',
+        ContentEncoding='gzip',
+        CacheControl=IMMUTABLE_CACHE_CONTROL
+    )
+
+
+def publish_category(db, category, s3_client, bucket, prefix, base_url):
+    """Upload results and ballot JSON for a locked category and record their URLs
+
+    Returns the published URLs, or None when the category was unlocked (or
+    deleted) in the meantime and so was left unpublished.
+    """
+    snapshot = db['results_snapshots'].find_one({'category_id': category['id']}, {'results': 1})
+    results = snapshot['results'] if snapshot else compute_standings(db, category['id'])
+
+    nominee_docs = db['nominees'].find(
+        {'category_id': category['id'], 'deleted': {'$ne': True}},
+        {'_id': 0, **{field: 1 for field in PUBLIC_NOMINEE_FIELDS}}
+    )
+    ballot = {
+        'id': category['id'],
+        'name': category.get('name', ''),
+        'description': category.get('description', ''),
+        'voting_locked': True,
+        'nominees': list(nominee_docs)
+    }
+
+    results_body = render(results)
+    ballot_body = render(ballot)
+    # Content-addressed keys: a republish with identical data reuses the objects
+    version = hashlib.sha256(results_body + ballot_body).hexdigest()[:16]
+    base_key = os.path.join(prefix or '', 'published', category['id'])
+    results_key = f"{base_key}/results-{version}.json"
+    ballot_key = f"{base_key}/ballot-{version}.json"
+
+    put_immutable(s3_client, bucket, results_key, results_body)
+    put_immutable(s3_client, bucket, ballot_key, ballot_body)
+
+    published = {
+        'version': version,
+        'results_url': f"{base_url}/{results_key}",
+        'ballot_url': f"{base_url}/{ballot_key}",
+        'published_at': datetime.datetime.now(datetime.UTC)
+    }
+    # Voting may have been reopened while the objects were uploading; its URLs would then show stale results
+    result = db['categories'].update_one(
+        {'id': category['id'], 'voting_locked': True, 'deleted': {'$ne': True}},
+        {'$set': {'published': published, 'version': next_version(db)}}
+    )
+    if not result.matched_count:
+        return None
+    return published
@@ -0,0 +1,228 @@
+"""
+Query-shape statistics and slow-query log.
+
+QueryObserver is a PyMongo CommandListener that reduces every command to its
+shape (collection, operation and filter/pipeline structure with the literal
+values replaced by "?") and keeps count, total time and max time per shape.
+Commands slower than the threshold are logged and explained on a background
+thread so the request that hit the slow query does not wait for the explain.
+"""
+import datetime
+import json
+import queue
+import threading
+import time
+
+from flask import has_request_context, request
+from pymongo import monitoring
+
+# Handshake, session and cursor bookkeeping commands are not query shapes
+IGNORED_COMMANDS = {
+    'isMaster', 'ismaster', 'hello', 'ping', 'buildInfo', 'buildinfo', 'saslStart',
+    'saslContinue', 'endSessions', 'killCursors', 'getMore', 'explain', 'listIndexes',
+    'createIndexes', 'getLastError'
+}
+
+# Commands that accept an explain
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'update', 'delete', 'findAndModify'}
+
+# Driver-added fields that must not be passed back inside an explain
+DRIVER_FIELDS = {'lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber', '$readConcern'}
+
+
+def value_shape(value):
+    """Replace literals with placeholders while keeping keys and operators"""
+    if isinstance(value, dict):
+        return {key: value_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [value_shape(item) for item in value]
+        return ['?']
+    if isinstance(value, str) and value.startswith('$'):
+        # Field paths such as "$nominee_id" are part of the shape
+        return value
+    return '?'
+
+
+def command_shape(command_name, command):
+    """Normalize a command document to a stable shape string"""
+    collection = command.get(command_name)
+    shape = {'op': command_name, 'coll': collection if isinstance(collection, str) else None}
+    if command_name == 'find':
+        shape['filter'] = value_shape(command.get('filter', {}))
+        if command.get('sort'):
+            shape['sort'] = list(command['sort'])
+        if command.get('projection'):
+            shape['projection'] = sorted(command['projection'])
+    elif command_name == 'aggregate':
+        shape['pipeline'] = [value_shape(stage) for stage in command.get('pipeline', [])]
+    elif command_name in ('update', 'delete'):
+        statements = command.get('updates' if command_name == 'update' else 'deletes', [])
+        shape['q'] = value_shape(statements[0].get('q', {})) if statements else {}
+        if command_name == 'update' and statements:
+            update = statements[0].get('u', {})
+            shape['u'] = sorted(update) if isinstance(update, dict) else '?'
+    elif command_name == 'findAndModify':
+        shape['q'] = value_shape(command.get('query', {}))
+    elif command_name in ('count', 'distinct'):
+        shape['q'] = value_shape(command.get('query', {}))
+    return json.dumps(shape, sort_keys=True, default=str)
+
+
+def summarize_plan(plan):
+    """Flatten a winning plan into 'STAGE <- STAGE(index)' form"""
+    stages = []
+    while plan:
+        stage = plan.get('stage', '?')
+        if plan.get('indexName'):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get('inputStage') or (plan.get('inputStages') or [None])[0]
+    return ' <- '.join(stages)
+
+
+def explain_summary(explain):
+    """Pull the interesting parts out of an explain result"""
+    planner = explain.get('queryPlanner')
+    if planner is None and explain.get('stages'):
+        # Aggregations nest the planner output in the first ($cursor) stage
+        cursor_stage = explain['stages'][0].get('$cursor', {})
+        planner = cursor_stage.get('queryPlanner')
+        explain = cursor_stage
+    summary = {}
+    if planner:
+        summary['winning_plan'] = summarize_plan(planner.get('winningPlan', {}).get('queryPlan')
+                                                 or planner.get('winningPlan', {}))
+    stats = explain.get('executionStats')
+    if stats:
+        summary.update({
+            'n_returned': stats.get('nReturned'),
+            'keys_examined': stats.get('totalKeysExamined'),
+            'docs_examined': stats.get('totalDocsExamined'),
+            'execution_ms': stats.get('executionTimeMillis')
+        })
+    return summary
+
+
+class QueryObserver(monitoring.CommandListener):
+    """Per-shape query statistics with a slow-query log"""
+
+    def __init__(self, slow_ms=100, max_shapes=500, explain_verbosity='queryPlanner',
+                 explain_interval=60):
+        self.slow_ms = slow_ms
+        self.max_shapes = max_shapes
+        self.explain_verbosity = explain_verbosity
+        self.explain_interval = explain_interval
+        self.client = None
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.started_at = datetime.datetime.now(datetime.UTC)
+        self._pending = {}
+        self._explain_queue = queue.Queue(maxsize=100)
+        self._thread = None
+
+    def bind(self, client):
+        """Set the client used to run explains and start the explain thread"""
+        self.client = client
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run_explains, name='query-explain', daemon=True)
+            self._thread.start()
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        endpoint = None
+        if has_request_context() and request.url_rule is not None:
+            endpoint = f"{request.method} {request.url_rule.rule}"
+        self._pending[event.request_id] = (event.command_name, event.database_name,
+                                           event.command, endpoint)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed=False):
+        pending = self._pending.pop(event.request_id, None)
+        if pending is None:
+            return
+        command_name, database_name, command, endpoint = pending
+        elapsed_ms = event.duration_micros / 1000.0
+        shape = command_shape(command_name, command)
+
+        with self.lock:
+            stats = self.stats.get(shape)
+            if stats is None:
+                if len(self.stats) >= self.max_shapes:
+                    # Drop the cheapest shape to keep memory bounded
+                    cheapest = min(self.stats, key=lambda s: self.stats[s]['total_ms'])
+                    del self.stats[cheapest]
+                stats = self.stats[shape] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'failures': 0,
+                    'slow_count': 0, 'endpoints': set(), 'explain': None, 'explained_at': None
+                }
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if failed:
+                stats['failures'] += 1
+            if endpoint and len(stats['endpoints']) < 10:
+                stats['endpoints'].add(endpoint)
+
+            slow = elapsed_ms >= self.slow_ms
+            explain_due = False
+            if slow:
+                stats['slow_count'] += 1
+                now = time.monotonic()
+                if stats['explained_at'] is None or now - stats['explained_at'] >= self.explain_interval:
+                    stats['explained_at'] = now
+                    explain_due = command_name in EXPLAINABLE_COMMANDS
+
+        if slow:
+            print(f"Slow query {elapsed_ms:.1f}ms ({endpoint or 'no request'}): {shape}")
+            if explain_due and self.client is not None:
+                try:
+                    self._explain_queue.put_nowait((shape, database_name, command))
+                except queue.Full:
+                    pass
+
+    def _run_explains(self):
+        while True:
+            shape, database_name, command = self._explain_queue.get()
+            try:
+                explainable = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+                result = self.client[database_name].command(
+                    {'explain': explainable, 'verbosity': self.explain_verbosity}
+                )
+                summary = explain_summary(result)
+                with self.lock:
+                    if shape in self.stats:
+                        self.stats[shape]['explain'] = summary
+                print(f"Slow query plan for {shape}: {summary}")
+            except Exception as e:
+                print(f"Error explaining slow query: {str(e)}")
+
+    def top(self, limit=20, sort='total_ms'):
+        """Return the most expensive shapes, most expensive first"""
+        with self.lock:
+            rows = []
+            for shape, stats in self.stats.items():
+                rows.append({
+                    'shape': json.loads(shape),
+                    'count': stats['count'],
+                    'total_ms': round(stats['total_ms'], 3),
+                    'avg_ms': round(stats['total_ms'] / stats['count'], 3),
+                    'max_ms': round(stats['max_ms'], 3),
+                    'slow_count': stats['slow_count'],
+                    'failures': stats['failures'],
+                    'endpoints': sorted(stats['endpoints']),
+                    'explain': stats['explain']
+                })
+        rows.sort(key=lambda row: row.get(sort, row['total_ms']), reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.started_at = datetime.datetime.now(datetime.UTC)
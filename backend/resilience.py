@@ -0,0 +1,250 @@
+"""
+Latency budgets and circuit breakers around MongoDB and S3.
+
+Every request that uses MongoDB runs under a deadline (pymongo.timeout), so
+a slow primary costs a worker MONGO_REQUEST_BUDGET_MS at most instead of the
+5 s server selection timeout. Timeouts and connection failures trip the
+MongoDB breaker, including ones a handler catches itself (record_outage);
+while it is open, requests fail fast with a 503, except for views marked
+without_mongo, which never need it, and views marked handles_outage, which
+serve what they have (compression.cached_json serves the last good response
+past its expiry). After CIRCUIT_RESET_SECONDS one request is let through to
+probe the database, and the breaker closes on the next successful command.
+
+The S3 client gets connect/read timeouts and its own breaker, hooked into
+botocore's event system; calls made while it is open raise CircuitOpen.
+"""
+import os
+import threading
+import time
+
+import pymongo
+from botocore.config import Config
+from botocore.exceptions import ConnectionError as BotocoreConnectionError, ReadTimeoutError
+from flask import g, request
+from pymongo import monitoring
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, WTimeoutError
+
+from instrumentation import metrics
+
+MONGO_REQUEST_BUDGET = float(os.getenv('MONGO_REQUEST_BUDGET_MS', '2000')) / 1000
+FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '10'))
+# How long an expired cached response may still be served while MongoDB is down
+STALE_SECONDS = int(os.getenv('STALE_RESPONSE_SECONDS', '86400'))
+
+S3_CONFIG = Config(
+    connect_timeout=float(os.getenv('S3_CONNECT_TIMEOUT_SECONDS', '2')),
+    read_timeout=float(os.getenv('S3_READ_TIMEOUT_SECONDS', '5')),
+    retries={'max_attempts': 2, 'mode': 'standard'}
+)
+
+# Errors that say the dependency is unreachable or slow, not that the request was wrong
+MONGO_OUTAGE_ERRORS = (ConnectionFailure, ExecutionTimeout, WTimeoutError)
+S3_OUTAGE_ERRORS = (BotocoreConnectionError, ReadTimeoutError)
+
+metrics.describe('napling_circuit_transitions_total', 'counter', 'Circuit breaker state changes')
+metrics.describe('napling_circuit_rejections_total', 'counter', 'Calls refused by an open circuit breaker')
+metrics.describe('napling_stale_responses_total', 'counter', 'Expired cached responses served during an outage')
+
+
+class CircuitOpen(Exception):
+    """A call was refused because its dependency's breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open (one probe) -> closed"""
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+
+    def _transition(self, state):
+        self.state = state
+        metrics.inc('napling_circuit_transitions_total', {'breaker': self.name, 'state': state})
+        print(f"Circuit breaker {self.name} is {state}")
+
+    def allow(self):
+        """Whether a call may go ahead; in half-open state only one probe at a time does"""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if self.state == 'open' and now - self.opened_at >= self.reset_seconds:
+                self._transition('half-open')
+            elif self.state == 'half-open' and now - self.probe_started < self.reset_seconds:
+                metrics.inc('napling_circuit_rejections_total', {'breaker': self.name})
+                return False
+            if self.state == 'half-open':
+                # A probe that never reported back is replaced after reset_seconds
+                self.probe_started = now
+                return True
+            metrics.inc('napling_circuit_rejections_total', {'breaker': self.name})
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            if self.state == 'half-open':
+                self._transition('closed')
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half-open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition('open')
+
+
+mongo_breaker = CircuitBreaker('mongodb')
+s3_breaker = CircuitBreaker('s3')
+
+
+def mongo_ok():
+    # Checked without the lock; the common case (closed, no failures) costs nothing
+    if mongo_breaker.state == 'half-open' or mongo_breaker.failures:
+        mongo_breaker.record_success()
+
+
+class MongoSuccessListener(monitoring.CommandListener):
+    """Closes the MongoDB breaker once a command succeeds again"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_ok()
+
+    def failed(self, event):
+        pass
+
+
+def record_outage(exc):
+    """Count a MongoDB error a handler caught itself (and so the error handler never sees)"""
+    if isinstance(exc, MONGO_OUTAGE_ERRORS):
+        mongo_breaker.record_failure()
+
+
+def unavailable(dependency='Database'):
+    return {'error': f'{dependency} temporarily unavailable'}, 503, {'Retry-After': str(int(RESET_SECONDS))}
+
+
+def handles_outage(view):
+    """Mark a view that serves something sensible without MongoDB"""
+    view.handles_outage = True
+    return view
+
+
+def without_mongo(view):
+    """Mark a view that never touches MongoDB: no fail-fast check, no deadline"""
+    view.uses_mongo = False
+    return view
+
+
+def mongo_budget(seconds):
+    """Override the MongoDB deadline of one view (None: no deadline, e.g. for streamed exports)"""
+    def decorator(view):
+        view.mongo_budget = seconds
+        return view
+    return decorator
+
+
+def lift_mongo_deadline():
+    """End the current request's MongoDB deadline early
+
+    For a view that only sometimes streams (a whole view can opt out with
+    mongo_budget(None)): call it before returning the streamed response,
+    whose cursor runs long after the budget would have expired.
+    """
+    deadline = g.pop('mongo_deadline', None)
+    if deadline is not None:
+        deadline.__exit__(None, None, None)
+
+
+def init_app(app):
+    """Install the per-request MongoDB deadline, the fail-fast check and the outage error handler"""
+
+    @app.before_request
+    def start_mongo_deadline():
+        view = app.view_functions.get(request.endpoint)
+        if view is None or not getattr(view, 'uses_mongo', True):
+            return
+        if not getattr(view, 'handles_outage', False) and not mongo_breaker.allow():
+            return unavailable()
+        budget = getattr(view, 'mongo_budget', MONGO_REQUEST_BUDGET)
+        if budget:
+            g.mongo_deadline = pymongo.timeout(budget)
+            g.mongo_deadline.__enter__()
+
+    @app.teardown_request
+    def end_mongo_deadline(exc):
+        lift_mongo_deadline()
+
+    def mongo_outage(exc):
+        mongo_breaker.record_failure()
+        print(f"MongoDB unavailable: {exc}")
+        return unavailable()
+
+    for error in MONGO_OUTAGE_ERRORS:
+        app.register_error_handler(error, mongo_outage)
+
+    @app.errorhandler(CircuitOpen)
+    def circuit_open(exc):
+        return unavailable(str(exc))
+
+
+def guard_s3(s3_client):
+    """Refuse S3 calls while the S3 breaker is open and feed it every call's outcome"""
+    events = s3_client.meta.events
+
+    def before_call(**kwargs):
+        if not s3_breaker.allow():
+            raise CircuitOpen('S3')
+
+    def after_call(http_response, **kwargs):
+        if http_response.status_code >= 500:
+            s3_breaker.record_failure()
+        else:
+            s3_breaker.record_success()
+
+    def after_call_error(exception, **kwargs):
+        if isinstance(exception, S3_OUTAGE_ERRORS):
+            s3_breaker.record_failure()
+
+    events.register('before-call.s3', before_call)
+    events.register('after-call.s3', after_call)
+    events.register('after-call-error.s3', after_call_error)
+
+
+def count_stale():
+    metrics.inc('napling_stale_responses_total', {'endpoint': request.url_rule.rule if request.url_rule else ''})
+
+
+def outage_fallback(load, stale):
+    """load() unless MongoDB is down, in which case stale (if there is one) is returned instead
+
+    Returns (value, is_stale). Without a stale value the outage propagates:
+    CircuitOpen when the breaker refuses the call, or the MongoDB error.
+    """
+    if not mongo_breaker.allow():
+        if stale is None:
+            raise CircuitOpen('Database')
+        count_stale()
+        return stale, True
+    try:
+        value = load()
+    except MONGO_OUTAGE_ERRORS as exc:
+        if stale is None:
+            raise
+        mongo_breaker.record_failure()
+        print(f"MongoDB unavailable, serving a stale response: {exc}")
+        count_stale()
+        return stale, True
+    mongo_ok()
+    return value, False
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Per-minute and per-hour vote counts for trend charts.
+
+Each vote $inc's one bucket per granularity for its nominee; changing a vote
+also decrements the previous nominee, so buckets hold net votes and their
+running sum is the live tally. Documents look like
+
+    {'category_id': ObjectId, 'nominee_id': ObjectId, 'granularity': 'minute',
+     'bucket': datetime, 'count': int}
+
+Run this module to rebuild the buckets from the votes collection, e.g. after
+adding rollups to an event that already has votes. Closed-out categories no
+longer hold their votes, so rebuild them before close-out, not after:
+
+    python rollups.py [--category-id <id>]
+"""
+import argparse
+import datetime
+import os
+from collections import Counter
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from vote_keys import id_match
+
+GRANULARITIES = ('minute', 'hour')
+
+
+def truncate(at, granularity):
+    if granularity == 'hour':
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(second=0, microsecond=0)
+
+
+def bucket_filter(category_id, nominee_id, granularity, at):
+    return {
+        'category_id': ObjectId(category_id),
+        'granularity': granularity,
+        'bucket': truncate(at, granularity),
+        'nominee_id': ObjectId(nominee_id)
+    }
+
+
+def record_vote(rollups, category_id, nominee_id, at, previous_nominee_id=None):
+    """Count a vote (and uncount the one it replaces) in a single round-trip"""
+    operations = []
+    for granularity in GRANULARITIES:
+        operations.append(UpdateOne(
+            bucket_filter(category_id, nominee_id, granularity, at), {'$inc': {'count': 1}}, upsert=True
+        ))
+        if previous_nominee_id is not None:
+            operations.append(UpdateOne(
+                bucket_filter(category_id, previous_nominee_id, granularity, at), {'$inc': {'count': -1}}, upsert=True
+            ))
+    rollups.bulk_write(operations, ordered=False)
+
+
+def timeline(rollups, category_id, granularity, since=None, until=None):
+    """Buckets for a category in time order, each with its count per nominee"""
+    query = {'category_id': ObjectId(category_id), 'granularity': granularity}
+    if since or until:
+        query['bucket'] = {}
+        if since:
+            query['bucket']['$gte'] = since
+        if until:
+            query['bucket']['$lt'] = until
+
+    buckets = []
+    for doc in rollups.find(query, {'_id': 0, 'bucket': 1, 'nominee_id': 1, 'count': 1}).sort('bucket', 1):
+        if not buckets or buckets[-1]['bucket'] != doc['bucket']:
+            buckets.append({'bucket': doc['bucket'], 'counts': {}})
+        buckets[-1]['counts'][str(doc['nominee_id'])] = doc['count']
+    return buckets
+
+
+def backfill(db, category_id=None, batch_size=5000):
+    """Recompute buckets from the current votes, replacing existing ones"""
+    query = {'category_id': id_match(category_id)} if category_id else {}
+    counts = Counter()
+    for vote in db['votes'].find(query, {'_id': 0, 'category_id': 1, 'nominee_id': 1, 'created_at': 1},
+                                 batch_size=batch_size):
+        if not vote.get('created_at'):
+            continue
+        for granularity in GRANULARITIES:
+            counts[(str(vote['category_id']), str(vote['nominee_id']), granularity,
+                    truncate(vote['created_at'], granularity))] += 1
+
+    rollups = db['vote_rollups']
+    rollups.delete_many({'category_id': ObjectId(category_id)} if category_id else {})
+    docs = [
+        {**bucket_filter(cat, nominee, granularity, bucket), 'count': count}
+        for (cat, nominee, granularity, bucket), count in counts.items()
+    ]
+    for start in range(0, len(docs), batch_size):
+        rollups.insert_many(docs[start:start + batch_size], ordered=False)
+    return len(docs)
+
+
+def main():
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Rebuild vote rollup buckets from votes')
+    parser.add_argument('--category-id', help='Only rebuild this category')
+    args = parser.parse_args()
+
+    # MongoDB connection
+    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    db = client['napling_choice_awards']
+    db['vote_rollups'].create_index(
+        [('category_id', 1), ('granularity', 1), ('bucket', 1), ('nominee_id', 1)], unique=True
+    )
+
+    started = datetime.datetime.now(datetime.UTC)
+    buckets = backfill(db, args.category_id)
+    print(f"Wrote {buckets} buckets in {(datetime.datetime.now(datetime.UTC) - started).total_seconds():.1f}s")
+
+
+if __name__ == '__main__':
+    main()
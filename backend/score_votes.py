@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Offline vote-abuse scorer.
+
+Replays the historical votes collection in created_at order through the same
+VoteGuard counters used on the live vote path and records any surges it finds
+in vote_flags (source "offline").
+
+Compact votes keep only a keyed hash of the voter's /24 (see vote_keys), which
+counts the same as the prefix itself. Votes migrated or cast before that
+field existed have no IP information at all; they still feed the nominee
+surge check, and the run ends with a warning saying how many were left out
+of the prefix check.
+"""
+from pymongo import MongoClient
+import argparse
+import datetime
+import os
+from dotenv import load_dotenv
+from vote_guard import VoteGuard
+from vote_keys import id_match
+
+load_dotenv()
+
+# MongoDB connection
+client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+db = client['napling_choice_awards']
+
+# Collections
+votes = db['votes']
+vote_flags = db['vote_flags']
+
+def score_votes(category_id=None, dry_run=False, batch_size=5000):
+    """Scan votes oldest first and flag anomalous surges"""
+    guard = VoteGuard(
+        vote_flags,
+        prefix_limit=int(os.getenv('VOTE_GUARD_PREFIX_LIMIT', '30')),
+        prefix_window=int(os.getenv('VOTE_GUARD_PREFIX_WINDOW', '300')),
+        surge_factor=float(os.getenv('VOTE_GUARD_SURGE_FACTOR', '5')),
+        surge_min_votes=int(os.getenv('VOTE_GUARD_SURGE_MIN_VOTES', '50'))
+    )
+
+    query = {}
+    if category_id:
+        query['category_id'] = id_match(category_id)
+
+    cursor = votes.find(
+        query,
+        {'_id': 0, 'category_id': 1, 'nominee_id': 1, 'voter_ip': 1, 'voter_prefix': 1, 'created_at': 1},
+        batch_size=batch_size,
+        allow_disk_use=True
+    ).sort('created_at', 1)
+
+    scanned = 0
+    flagged = 0
+    no_prefix = 0
+    pending = []
+    for vote in cursor:
+        scanned += 1
+        created_at = vote.get('created_at')
+        if not created_at:
+            continue
+        # PyMongo returns naive datetimes that are already in UTC
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=datetime.UTC)
+
+        # Compact votes carry a hash of the prefix instead of the IP
+        prefix = vote['voter_prefix'].hex() if vote.get('voter_prefix') else None
+        if not prefix and not vote.get('voter_ip'):
+            no_prefix += 1
+        for flag in guard.observe(vote.get('voter_ip'), str(vote['category_id']),
+                                  str(vote['nominee_id']), created_at.timestamp(),
+                                  source='offline', prefix=prefix):
+            flagged += 1
+            print(f"{flag['observed_at']} {flag['kind']}: {flag['key']} ({flag['count']} votes)")
+            pending.append(flag)
+
+        if len(pending) >= 1000 and not dry_run:
+            vote_flags.insert_many(pending)
+            pending = []
+
+    if pending and not dry_run:
+        vote_flags.insert_many(pending)
+
+    print(f"\nScanned {scanned} votes, found {flagged} anomalies")
+    if no_prefix:
+        print(f"WARNING: {no_prefix} votes have neither voter_ip nor voter_prefix and were "
+              f"left out of the per-prefix check; only nominee surges cover them")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Score historical votes for abuse')
+    parser.add_argument('--category-id', help='Only score votes for this category')
+    parser.add_argument('--dry-run', action='store_true', help='Print flags without saving them')
+    args = parser.parse_args()
+    score_votes(category_id=args.category_id, dry_run=args.dry_run)
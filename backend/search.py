@@ -0,0 +1,115 @@
+"""
+In-process nominee search.
+
+Each worker keeps a compact prefix index over nominee names and
+descriptions: a sorted list of distinct tokens, each with the nominees it
+appears in. A query term matches every token it is a prefix of (found with
+bisect), so "naps" finds "napster" as you type. The index is rebuilt when
+the change version moves, the same signal the ballot uses, so every worker
+sees edits made through any other one. An index built while writes may still
+be landing (see changes.version_state) is rebuilt again, at most once per
+UNSETTLED_REBUILD_SECONDS.
+
+Scores add up per query term: a name hit counts more than a description
+hit, and an exact word more than a prefix. Every term has to match.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+
+from changes import version_state
+
+TOKEN = re.compile(r'\w+')
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+EXACT_BONUS = 2
+MAX_QUERY_TERMS = 8
+RESULT_FIELDS = ('id', 'name', 'description', 'category_id', 'image_url', 'youtube_url')
+UNSETTLED_REBUILD_SECONDS = 1
+
+
+def tokenize(text):
+    return TOKEN.findall((text or '').lower())
+
+
+class NomineeIndex:
+    """Prefix index over one snapshot of the nominees collection"""
+
+    def __init__(self, version, nominee_docs, settled=True):
+        self.version = version
+        self.settled = settled
+        self.built_at = time.monotonic()
+        self.nominees = []
+        postings = {}
+        for doc in sorted(nominee_docs, key=lambda doc: (doc.get('name') or '').lower()):
+            position = len(self.nominees)
+            self.nominees.append({field: doc.get(field, '') for field in RESULT_FIELDS})
+            for field, weight in (('description', DESCRIPTION_WEIGHT), ('name', NAME_WEIGHT)):
+                for token in tokenize(doc.get(field)):
+                    # A name hit wins over a description hit of the same token
+                    entry = postings.setdefault(token, {})
+                    entry[position] = max(entry.get(position, 0), weight)
+        self.tokens = sorted(postings)
+        self.postings = [postings[token] for token in self.tokens]
+
+    def term_scores(self, term):
+        """Best score per nominee for one query term"""
+        scores = {}
+        start = bisect.bisect_left(self.tokens, term)
+        for i in range(start, len(self.tokens)):
+            token = self.tokens[i]
+            if not token.startswith(term):
+                break
+            bonus = EXACT_BONUS if token == term else 1
+            for position, weight in self.postings[i].items():
+                scores[position] = max(scores.get(position, 0), weight * bonus)
+        return scores
+
+    def search(self, query, category_id=None, offset=0, limit=20):
+        """Total number of nominees matching every query term, and one ranked page of them"""
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return 0, []
+        # Start from the rarest term so the intersection stays small
+        per_term = sorted((self.term_scores(term) for term in terms), key=len)
+        totals = per_term[0]
+        for scores in per_term[1:]:
+            totals = {position: score + scores[position] for position, score in totals.items() if position in scores}
+        if category_id:
+            totals = {position: score for position, score in totals.items()
+                      if self.nominees[position]['category_id'] == category_id}
+
+        # Positions follow name order, so ties rank alphabetically
+        ranked = heapq.nsmallest(offset + limit, totals, key=lambda position: (-totals[position], position))
+        page = [dict(self.nominees[position], score=totals[position]) for position in ranked[offset:]]
+        return len(totals), page
+
+
+class NomineeSearch:
+    """The current worker's index, rebuilt whenever the change version moves"""
+
+    def __init__(self, db, not_deleted):
+        self.db = db
+        self.not_deleted = not_deleted
+        self.index = None
+        self.lock = threading.Lock()
+
+    def fresh(self, index, version):
+        return (index is not None and index.version == version
+                and (index.settled or time.monotonic() - index.built_at < UNSETTLED_REBUILD_SECONDS))
+
+    def current(self):
+        version, settled = version_state(self.db)
+        if self.fresh(self.index, version):
+            return self.index
+        with self.lock:
+            if not self.fresh(self.index, version):
+                # Read the version first; a write during the build then triggers another rebuild
+                nominee_docs = self.db['nominees'].find(
+                    {**self.not_deleted, 'id': {'$exists': True}},
+                    {'_id': 0, **{field: 1 for field in RESULT_FIELDS}}
+                )
+                self.index = NomineeIndex(version, nominee_docs, settled)
+            return self.index
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Serving the React build without a front proxy.
+
+The build directory is indexed once at startup. Requests for a known file
+get the smallest pre-built variant the client accepts (.br, then .gz),
+hashed assets under static/ are cached for a year as immutable, and files are
+handed to the server through send_file so gunicorn can use sendfile. Unknown
+paths fall back to index.html for client-side routing.
+
+Pre-build the compressed variants after `npm run build` with
+
+    python static_files.py ../frontend/build
+
+(.br files are only written when the optional brotli package is installed).
+"""
+import gzip
+import mimetypes
+import os
+import sys
+
+from flask import send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Files CRA names with a content hash; safe to cache forever
+HASHED_PREFIX = 'static/'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_EXTENSIONS = {'.html', '.js', '.css', '.json', '.map', '.svg', '.txt', '.ico', '.xml'}
+MIN_COMPRESS_BYTES = 1024
+# Checked in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticSite:
+    """In-memory index of a build directory"""
+
+    def __init__(self, build_dir):
+        self.build_dir = os.path.abspath(build_dir)
+        self.files = {}
+        if not os.path.isdir(self.build_dir):
+            print(f"Frontend build not found at {self.build_dir}")
+            return
+        paths = set()
+        for root, _, names in os.walk(self.build_dir):
+            for name in names:
+                paths.add(os.path.relpath(os.path.join(root, name), self.build_dir).replace(os.sep, '/'))
+        for path in paths:
+            if path.endswith(('.br', '.gz')) and path[:-3] in paths:
+                continue
+            self.files[path] = {
+                'path': os.path.join(self.build_dir, path),
+                'mimetype': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                'variants': [(encoding, os.path.join(self.build_dir, path + suffix))
+                             for encoding, suffix in ENCODINGS if path + suffix in paths],
+                'max_age': IMMUTABLE_MAX_AGE if path.startswith(HASHED_PREFIX) else 0
+            }
+
+    def serve(self, path, accept_encodings):
+        """Response for a request path, given the request's parsed Accept-Encoding"""
+        entry = self.files.get(path) or self.files.get('index.html')
+        if entry is None:
+            return {'error': 'Frontend build not found'}, 404
+
+        file_path, encoding = entry['path'], None
+        for candidate, variant_path in entry['variants']:
+            if accept_encodings.quality(candidate) > 0:
+                file_path, encoding = variant_path, candidate
+                break
+
+        response = send_file(file_path, mimetype=entry['mimetype'], conditional=True,
+                             max_age=entry['max_age'] or None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entry['variants']:
+            response.vary.add('Accept-Encoding')
+        if entry['max_age']:
+            response.cache_control.immutable = True
+            response.cache_control.public = True
+        else:
+            # index.html and friends change on every deploy
+            response.cache_control.no_cache = True
+        return response
+
+
+def precompress(build_dir):
+    """Write .gz (and .br) next to every compressible file; returns bytes saved"""
+    saved = 0
+    for root, _, names in os.walk(build_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_BYTES:
+                continue
+            variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, compressed in variants:
+                # Keep a variant only when it actually helps
+                if len(compressed) < len(data):
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                    saved += len(data) - len(compressed)
+    return saved
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'build')
+    if brotli is None:
+        print("brotli is not installed; writing .gz variants only")
+    print(f"Saved {precompress(target)} bytes across compressed variants")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+MongoDB commands per request for the handlers that read and write documents.
+
+Runs the app against mongomock (every collection call counts as one command,
+see benchmark.count_mongomock_commands) with S3 mocked by moto, and checks
+the per-request count that production reports as
+napling_request_mongo_commands_total.
+
+    python -m pytest test_mongo_commands.py
+"""
+import random
+
+import pytest
+from bson import ObjectId
+
+import benchmark
+
+
+@pytest.fixture(scope='module')
+def app_module():
+    app_module = benchmark.load_app('mongomock')
+    benchmark.count_mongomock_commands(app_module.instrumentation)
+    return app_module
+
+
+@pytest.fixture
+def ballot(app_module):
+    return benchmark.seed(app_module, 2, 12, 200, random.Random(42), create_indexes=False)
+
+
+def commands(app_module, method, url, **kwargs):
+    """(status, MongoDB commands) for one request, with a cold response cache"""
+    app_module.cache.clear()
+    metrics = app_module.instrumentation.metrics
+
+    def total():
+        return sum(value for (name, _), value in metrics.counters.items()
+                   if name == 'napling_request_mongo_commands_total')
+
+    before = total()
+    response = app_module.app.test_client().open(url, method=method, **kwargs)
+    return response.status_code, int(total() - before)
+
+
+def test_results_cost_the_same_for_any_number_of_nominees(app_module, ballot):
+    # benchmark.seed shards the first category's tally and not the second's
+    sharded, legacy = ballot
+    # Leave the second category with only two nominees that have votes
+    app_module.votes.delete_many({'category_id': ObjectId(legacy),
+                                  'nominee_id': {'$nin': [ObjectId(n) for n in ballot[legacy][:2]]}})
+
+    # Category, counter shards or vote aggregation, one $in query for the nominees
+    assert commands(app_module, 'GET', f'/api/results/{sharded}') == (200, 3)
+    assert commands(app_module, 'GET', f'/api/results/{legacy}') == (200, 3)
+
+
+@pytest.mark.parametrize('position, counters', [(0, 1), (1, 0)], ids=['sharded', 'legacy'])
+def test_vote_commands(app_module, ballot, position, counters):
+    category_id = list(ballot)[position]
+    nominee_ids = ballot[category_id]
+    voter = {'X-Forwarded-For': '192.0.2.1'}
+
+    def vote(nominee_id):
+        return commands(app_module, 'POST', '/api/vote', headers=voter,
+                        json={'category_id': category_id, 'nominee_id': nominee_id})
+
+    # Category, replace (misses), insert, rollups, counter shards if sharded
+    assert vote(nominee_ids[0]) == (201, 4 + counters)
+    # Category, replace, rollups, counter shards if sharded
+    assert vote(nominee_ids[1]) == (201, 3 + counters)
+    assert commands(app_module, 'GET', f'/api/vote/{category_id}', headers=voter) == (200, 1)
+
+
+def test_nominee_writes_read_and_write_in_one_command(app_module, ballot):
+    headers = benchmark.admin_headers(app_module)
+    nominee_ids = next(iter(ballot.values()))
+
+    # Version counter, find_one_and_update
+    assert commands(app_module, 'DELETE', f'/api/nominees/{nominee_ids[0]}/image', headers=headers) == (200, 2)
+    # find_one_and_delete, votes, rollups, counters, version counter, tombstone
+    assert commands(app_module, 'DELETE', f'/api/nominees/{nominee_ids[1]}', headers=headers) == (200, 6)
+    assert commands(app_module, 'DELETE', f'/api/nominees/{nominee_ids[1]}', headers=headers) == (404, 1)
+
+
+def test_client_ip_is_parsed_once_per_request(app_module, ballot, monkeypatch):
+    category_id, nominee_ids = next(iter(ballot.items()))
+    parses = []
+    parse_client_ip = app_module.parse_client_ip
+    monkeypatch.setattr(app_module, 'parse_client_ip', lambda: parses.append(1) or parse_client_ip())
+    # The rate limiter keys on the client IP too
+    monkeypatch.setattr(app_module.limiter, 'enabled', True)
+
+    status, _ = commands(app_module, 'POST', '/api/vote', headers={'X-Forwarded-For': '192.0.2.2, 10.0.0.1'},
+                         json={'category_id': category_id, 'nominee_id': nominee_ids[0]})
+    assert status == 201
+    assert len(parses) == 1
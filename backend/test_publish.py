@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for publishing results to S3 (publish.py), against mongomock and a
+moto-mocked bucket; no AWS credentials or MongoDB server needed.
+
+    python -m pytest test_publish.py
+"""
+import gzip
+import json
+import os
+
+import boto3
+import mongomock
+from bson import ObjectId
+from moto import mock_aws
+
+import publish
+
+BUCKET = 'napling-test'
+BASE_URL = f'https://{BUCKET}.s3.us-east-1.amazonaws.com'
+
+
+def make_db(voting_locked=True):
+    """A category with two nominees and three votes"""
+    db = mongomock.MongoClient().db
+    category_id = str(ObjectId())
+    db['categories'].insert_one({'id': category_id, 'name': 'Best Nap', 'description': '',
+                                 'voting_locked': voting_locked})
+    nominee_ids = [str(ObjectId()), str(ObjectId())]
+    db['nominees'].insert_many([
+        {'id': nominee_id, 'name': f'Nominee {i}', 'description': '', 'category_id': category_id,
+         'image_url': '', 'youtube_url': ''}
+        for i, nominee_id in enumerate(nominee_ids)
+    ])
+    db['votes'].insert_many([
+        {'category_id': ObjectId(category_id), 'nominee_id': ObjectId(nominee_ids[i])} for i in (0, 0, 1)
+    ])
+    return db, db['categories'].find_one({'id': category_id})
+
+
+def mock_s3():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'test')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'test')
+    s3_client = boto3.client('s3', region_name='us-east-1')
+    s3_client.create_bucket(Bucket=BUCKET)
+    return s3_client
+
+
+def read_object(s3_client, url):
+    obj = s3_client.get_object(Bucket=BUCKET, Key=url[len(BASE_URL) + 1:])
+    assert obj['ContentEncoding'] == 'gzip'
+    assert obj['CacheControl'] == publish.IMMUTABLE_CACHE_CONTROL
+    return json.loads(gzip.decompress(obj['Body'].read()))
+
+
+@mock_aws
+def test_publish_uploads_results_and_records_urls():
+    s3_client = mock_s3()
+    db, category = make_db()
+
+    published = publish.publish_category(db, category, s3_client, BUCKET, 'uploads', BASE_URL)
+
+    stored = db['categories'].find_one({'id': category['id']})['published']
+    assert stored['results_url'] == published['results_url']
+    assert stored['ballot_url'] == published['ballot_url']
+    assert published['results_url'].startswith(f"{BASE_URL}/uploads/published/{category['id']}/results-")
+
+    results = read_object(s3_client, published['results_url'])
+    assert [result['vote_count'] for result in results] == [2, 1]
+    assert results[0]['nominee']['name'] == 'Nominee 0'
+    ballot = read_object(s3_client, published['ballot_url'])
+    assert ballot['voting_locked'] is True
+    assert len(ballot['nominees']) == 2
+
+
+@mock_aws
+def test_republish_reuses_content_addressed_urls():
+    s3_client = mock_s3()
+    db, category = make_db()
+
+    first = publish.publish_category(db, category, s3_client, BUCKET, 'uploads', BASE_URL)
+    second = publish.publish_category(db, category, s3_client, BUCKET, 'uploads', BASE_URL)
+
+    assert first['results_url'] == second['results_url']
+    assert first['ballot_url'] == second['ballot_url']
+
+
+@mock_aws
+def test_category_unlocked_during_publish_stays_unpublished():
+    s3_client = mock_s3()
+    db, category = make_db()
+    # An admin reopens voting after the job read the category
+    db['categories'].update_one({'id': category['id']}, {'$set': {'voting_locked': False}})
+
+    assert publish.publish_category(db, category, s3_client, BUCKET, 'uploads', BASE_URL) is None
+    assert 'published' not in db['categories'].find_one({'id': category['id']})
+
+
+if __name__ == '__main__':
+    test_publish_uploads_results_and_records_urls()
+    test_republish_reuses_content_addressed_urls()
+    test_category_unlocked_during_publish_stays_unpublished()
+    print("✓ All publish tests passed")
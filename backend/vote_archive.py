@@ -0,0 +1,70 @@
+"""
+Streaming serializers for raw votes.
+
+Votes are written one record at a time from a batched cursor and compressed
+incrementally, so memory stays flat however many votes are exported.
+"""
+import csv
+import datetime
+import io
+import json
+import zlib
+
+CSV_COLUMNS = ['id', 'category_id', 'nominee_id', 'voter_key', 'voter_ip', 'created_at']
+
+# Flush compressed output once this many bytes of input are buffered
+FLUSH_BYTES = 64 * 1024
+
+
+def vote_record(doc):
+    """Plain JSON-safe representation of a vote document"""
+    created_at = doc.get('created_at')
+    if created_at is not None and created_at.tzinfo is None:
+        # PyMongo returns naive datetimes that are already in UTC
+        created_at = created_at.replace(tzinfo=datetime.UTC)
+    return {
+        'id': str(doc['_id']),
+        'category_id': str(doc.get('category_id', '')),
+        'nominee_id': str(doc.get('nominee_id', '')),
+        # Compact votes carry a hashed voter key; votes not yet migrated the raw IP
+        'voter_key': doc['voter_key'].hex() if doc.get('voter_key') else '',
+        'voter_ip': doc.get('voter_ip', ''),
+        'created_at': created_at.isoformat() if created_at else None
+    }
+
+
+def iter_ndjson(cursor):
+    for doc in cursor:
+        yield json.dumps(vote_record(doc), separators=(',', ':')) + '\n'
+
+
+def iter_csv(cursor):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for doc in cursor:
+        writer.writerow(vote_record(doc))
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_stream(chunks, level=6):
+    """Compress an iterable of text chunks into gzip member bytes"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= FLUSH_BYTES:
+            compressed = compressor.compress(b''.join(pending))
+            pending, pending_size = [], 0
+            if compressed:
+                yield compressed
+    tail = compressor.compress(b''.join(pending)) + compressor.flush()
+    if tail:
+        yield tail
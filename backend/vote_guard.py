@@ -0,0 +1,183 @@
+"""
+Streaming vote-abuse detection.
+
+cast_vote hands each accepted vote to VoteGuard.submit(), which only does a
+non-blocking queue put. A daemon thread drains the queue and keeps sliding
+window counters per IP prefix and per nominee in fixed-size count-min
+sketches, so memory stays constant no matter how many distinct IPs show up.
+Anomalous surges are written to the vote_flags collection.
+"""
+import datetime
+import hashlib
+import ipaddress
+import queue
+import struct
+import threading
+import time
+from array import array
+
+
+class CountMinSketch:
+    """Fixed-size approximate counter (never under-counts)"""
+
+    def __init__(self, width=1024, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('I', [0]) * width for _ in range(depth)]
+
+    def _indexes(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        estimate = None
+        for row, index in zip(self.rows, self._indexes(key)):
+            row[index] += count
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        return estimate
+
+    def estimate(self, key):
+        return min(row[index] for row, index in zip(self.rows, self._indexes(key)))
+
+    def clear(self):
+        self.rows = [array('I', [0]) * self.width for _ in range(self.depth)]
+
+
+class SlidingWindowCounter:
+    """Sliding window made of a ring of count-min sketches, one per time slot"""
+
+    def __init__(self, window_seconds, slots=10, width=1024, depth=4):
+        self.window_seconds = window_seconds
+        self.slot_seconds = window_seconds / slots
+        self.slots = [CountMinSketch(width, depth) for _ in range(slots)]
+        self._head = 0
+        self._epoch = None
+
+    def _advance(self, now):
+        epoch = int(now // self.slot_seconds)
+        if self._epoch is None:
+            self._epoch = epoch
+            return
+        if epoch <= self._epoch:
+            # Late or same-slot events are counted in the current slot
+            return
+        for _ in range(min(epoch - self._epoch, len(self.slots))):
+            self._head = (self._head + 1) % len(self.slots)
+            self.slots[self._head].clear()
+        self._epoch = epoch
+
+    def add(self, key, now):
+        """Count one event for key and return the windowed estimate"""
+        self._advance(now)
+        self.slots[self._head].add(key)
+        return self.estimate(key)
+
+    def estimate(self, key):
+        return sum(slot.estimate(key) for slot in self.slots)
+
+
+def ip_prefix(ip):
+    """Collapse an address to its /24 (IPv4) or /48 (IPv6) network"""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return str(ip)
+    prefix_len = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f"{address}/{prefix_len}", strict=False))
+
+
+class VoteGuard:
+    """Detects vote surges per IP prefix and per nominee"""
+
+    def __init__(self, flags_collection, prefix_limit=30, prefix_window=300,
+                 nominee_window=60, nominee_baseline_window=1800,
+                 surge_factor=5.0, surge_min_votes=50, queue_size=10000,
+                 flag_cooldown=300):
+        self.flags = flags_collection
+        self.prefix_limit = prefix_limit
+        self.surge_factor = surge_factor
+        self.surge_min_votes = surge_min_votes
+        self.flag_cooldown = flag_cooldown
+        self.prefix_counter = SlidingWindowCounter(prefix_window)
+        self.nominee_counter = SlidingWindowCounter(nominee_window, slots=6)
+        self.nominee_baseline = SlidingWindowCounter(nominee_baseline_window, slots=30)
+        self._baseline_ratio = nominee_baseline_window / nominee_window
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last_flagged = {}
+        self._thread = None
+        self.dropped = 0
+
+    def submit(self, ip, category_id, nominee_id, at=None):
+        """Queue a vote for analysis without blocking the request"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put_nowait((ip, category_id, nominee_id, at or time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='vote-guard', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            ip, category_id, nominee_id, at = self._queue.get()
+            try:
+                for flag in self.observe(ip, category_id, nominee_id, at):
+                    self.flags.insert_one(flag)
+            except Exception as e:
+                print(f"Vote guard error: {str(e)}")
+
+    def observe(self, ip, category_id, nominee_id, at, source='stream', prefix=None):
+        """Update the counters with one vote and return any new flags
+
+        prefix stands in for ip_prefix(ip) when only a hash of it is known.
+        """
+        flags = []
+        if ip and prefix is None:
+            prefix = ip_prefix(ip)
+        if prefix:
+            prefix_key = f"{category_id}|{prefix}"
+            prefix_count = self.prefix_counter.add(prefix_key, at)
+            if prefix_count > self.prefix_limit:
+                flag = self._flag('ip_prefix_burst', prefix_key, at, source,
+                                  category_id=category_id, ip_prefix=prefix,
+                                  count=prefix_count, limit=self.prefix_limit,
+                                  window_seconds=self.prefix_counter.window_seconds)
+                if flag:
+                    flags.append(flag)
+
+        nominee_key = f"{category_id}|{nominee_id}"
+        recent = self.nominee_counter.add(nominee_key, at)
+        # The baseline includes the recent window, so the expected count is an
+        # upper bound and surges must clearly stand out from the long run rate
+        expected = self.nominee_baseline.add(nominee_key, at) / self._baseline_ratio
+        if recent >= self.surge_min_votes and recent > self.surge_factor * expected:
+            flag = self._flag('nominee_surge', nominee_key, at, source,
+                              category_id=category_id, nominee_id=nominee_id,
+                              count=recent, baseline=round(expected, 2),
+                              window_seconds=self.nominee_counter.window_seconds)
+            if flag:
+                flags.append(flag)
+        return flags
+
+    def _flag(self, kind, key, at, source, **details):
+        last = self._last_flagged.get((kind, key))
+        if last is not None and at - last < self.flag_cooldown:
+            return None
+        self._last_flagged[(kind, key)] = at
+        if len(self._last_flagged) > 10000:
+            cutoff = at - self.flag_cooldown
+            self._last_flagged = {k: v for k, v in self._last_flagged.items() if v >= cutoff}
+        return {
+            'kind': kind,
+            'key': key,
+            'source': source,
+            'observed_at': datetime.datetime.fromtimestamp(at, datetime.UTC),
+            'created_at': datetime.datetime.now(datetime.UTC),
+            **details
+        }
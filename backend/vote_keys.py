@@ -0,0 +1,116 @@
+"""
+Compact vote schema.
+
+Votes store the category and nominee as ObjectIds and the voter as a
+truncated HMAC of their IP address instead of the address itself, plus a
+shorter HMAC of the address's /24 (IPv6 /48) network so score_votes.py can
+still count votes per prefix:
+
+    {'_id': ObjectId, 'category_id': ObjectId, 'nominee_id': ObjectId,
+     'voter_key': bytes(16), 'voter_prefix': bytes(8), 'created_at': datetime}
+
+Votes written before migrate_votes.py has run still carry string ids and a
+plain 'voter_ip', so readers match both forms until the migration finishes.
+The legacy unique index exists exactly while legacy votes may (ensure_indexes
+creates it when it finds one, migrate_votes.py drops it when none are left),
+so voter lookups check for the index and leave out the legacy branch once it
+is gone; an unindexed $or branch would turn every lookup into a collection scan.
+"""
+import hashlib
+import hmac
+import os
+import time
+
+from bson import ObjectId
+
+from vote_guard import ip_prefix
+
+VOTER_KEY_BYTES = 16
+PREFIX_KEY_BYTES = 8
+LEGACY_INDEX = 'category_id_1_voter_ip_1'
+# How often each worker rechecks whether the legacy index is still there
+LEGACY_CHECK_SECONDS = 60
+
+_legacy = {'present': True, 'checked_at': None}
+
+
+def hash_secret():
+    """Key for voter hashes; changing it lets everyone vote again"""
+    secret = os.getenv('VOTER_HASH_KEY') or os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    return secret.encode('utf-8')
+
+
+def voter_key(ip, secret):
+    return hmac.new(secret, ip.encode('utf-8'), hashlib.sha256).digest()[:VOTER_KEY_BYTES]
+
+
+def prefix_key(ip, secret):
+    """Keyed hash of the voter's network, shared by every address in it"""
+    return hmac.new(secret, ip_prefix(ip).encode('utf-8'), hashlib.sha256).digest()[:PREFIX_KEY_BYTES]
+
+
+def id_match(id_string):
+    """Match a category or nominee id stored as either a string or an ObjectId"""
+    if ObjectId.is_valid(id_string):
+        return {'$in': [ObjectId(id_string), id_string]}
+    return id_string
+
+
+def legacy_votes_remain(votes):
+    """Whether votes may still use the legacy schema, i.e. the legacy index exists"""
+    now = time.monotonic()
+    if _legacy['checked_at'] is None or now - _legacy['checked_at'] >= LEGACY_CHECK_SECONDS:
+        _legacy['present'] = LEGACY_INDEX in votes.index_information()
+        _legacy['checked_at'] = now
+    return _legacy['present']
+
+
+def voter_match(category_id, ip, secret, legacy=True):
+    """Find one voter's vote in a category, under either schema while legacy votes remain"""
+    if not ObjectId.is_valid(category_id):
+        return {'category_id': category_id, 'voter_ip': ip}
+    if not legacy:
+        return {'category_id': ObjectId(category_id), 'voter_key': voter_key(ip, secret)}
+    return {'$or': [
+        {'category_id': ObjectId(category_id), 'voter_key': voter_key(ip, secret)},
+        {'category_id': category_id, 'voter_ip': ip}
+    ]}
+
+
+def compact_vote(doc, secret):
+    """New-schema fields for a legacy vote document"""
+    return {
+        'category_id': ObjectId(doc['category_id']),
+        'nominee_id': ObjectId(doc['nominee_id']),
+        'voter_key': voter_key(doc['voter_ip'], secret),
+        'voter_prefix': prefix_key(doc['voter_ip'], secret)
+    }
+
+
+def public_vote(doc):
+    """A vote as returned to the voter, with string ids and no voter identity"""
+    return {
+        'id': str(doc['_id']),
+        'category_id': str(doc['category_id']),
+        'nominee_id': str(doc['nominee_id']),
+        'created_at': doc.get('created_at')
+    }
+
+
+def ensure_indexes(votes):
+    """One vote per voter per category, for both schemas, plus the category index
+
+    The unique indexes are partial, so (category_id, _id) serves every
+    per-category read: results, exports, close-out and cascade deletes.
+    """
+    legacy = votes.index_information().get(LEGACY_INDEX)
+    if legacy and 'partialFilterExpression' not in legacy:
+        # A plain unique index sees every new-schema vote as voter_ip null
+        votes.drop_index(LEGACY_INDEX)
+        legacy = None
+    if legacy is None and votes.find_one({'voter_ip': {'$exists': True}}, {'_id': 1}):
+        votes.create_index([('category_id', 1), ('voter_ip', 1)], unique=True,
+                           partialFilterExpression={'voter_ip': {'$exists': True}})
+    votes.create_index([('category_id', 1), ('voter_key', 1)], unique=True,
+                       partialFilterExpression={'voter_key': {'$exists': True}})
+    votes.create_index([('category_id', 1), ('_id', 1)])
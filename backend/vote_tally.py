@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Sharded vote counters.
+
+A single counter document per nominee turns into a write hotspot when one
+nominee goes viral, so each nominee's tally is split over K shard documents
+in vote_counters:
+
+    {'category_id': ObjectId, 'nominee_id': ObjectId, 'shard': int, 'count': int}
+
+A vote $inc's one randomly chosen shard and results sum every shard of the
+category. K comes from the category's counter_shards field and can be raised
+or lowered at any time, since reads sum whatever shards exist. Categories
+with tally set to 'sharded' are served from the counters; older categories
+are switched over with
+
+    python vote_tally.py --category-id <id> [--shards 16]
+"""
+import argparse
+import os
+import random
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from vote_keys import id_match
+
+DEFAULT_SHARDS = int(os.getenv('VOTE_COUNTER_SHARDS', '8'))
+# Holds the votes counted by a backfill; live votes go to shards 0..K-1
+BASE_SHARD = -1
+
+
+def shard_update(category_id, nominee_id, shard, delta):
+    return UpdateOne(
+        {'category_id': ObjectId(category_id), 'nominee_id': ObjectId(nominee_id), 'shard': shard},
+        {'$inc': {'count': delta}},
+        upsert=True
+    )
+
+
+def record_vote(counters, category_id, nominee_id, shards, previous_nominee_id=None):
+    """Count a vote on a random shard, moving it from the previous nominee if any"""
+    operations = [shard_update(category_id, nominee_id, random.randrange(shards), 1)]
+    if previous_nominee_id is not None:
+        operations.append(shard_update(category_id, previous_nominee_id, random.randrange(shards), -1))
+    counters.bulk_write(operations, ordered=False)
+
+
+def totals(counters, category_id):
+    """Vote count per nominee id, summed over all shards"""
+    counts = {}
+    for doc in counters.find({'category_id': ObjectId(category_id)}, {'_id': 0, 'nominee_id': 1, 'count': 1}):
+        nominee_id = str(doc['nominee_id'])
+        counts[nominee_id] = counts.get(nominee_id, 0) + doc['count']
+    return counts
+
+
+def live_totals(counters, category_id):
+    """Vote count per nominee id in the live shards, leaving out the base shard"""
+    live = {}
+    for doc in counters.find({'category_id': ObjectId(category_id), 'shard': {'$ne': BASE_SHARD}},
+                             {'_id': 0, 'nominee_id': 1, 'count': 1}):
+        nominee_id = str(doc['nominee_id'])
+        live[nominee_id] = live.get(nominee_id, 0) + doc['count']
+    return live
+
+
+def enable(db, category_id, shards=DEFAULT_SHARDS, attempts=3):
+    """Start counting a category's votes in shards and backfill what is already there
+
+    The base shard gets the aggregate of the votes minus what the live shards
+    held at the same moment. The live shards are read before and after the
+    aggregate, and the pass is repeated until no vote landed in between. If
+    the category never goes quiet the earlier read is used: a vote cast
+    during the aggregate may then count twice, but none is lost.
+    """
+    categories = db['categories']
+    counters = db['vote_counters']
+    # Live votes start landing in shards as soon as counter_shards is set
+    categories.update_one({'id': category_id}, {'$set': {'counter_shards': shards, 'tally': 'backfilling'}})
+
+    pipeline = [
+        {'$match': {'category_id': id_match(category_id)}},
+        {'$group': {'_id': {'$toString': '$nominee_id'}, 'votes': {'$sum': 1}}}
+    ]
+    for attempt in range(attempts):
+        live = live_totals(counters, category_id)
+        counted = {doc['_id']: doc['votes'] for doc in db['votes'].aggregate(pipeline)}
+        if live_totals(counters, category_id) == live:
+            break
+    else:
+        print(f"Category {category_id} kept voting during the backfill; votes cast meanwhile may count twice")
+
+    # The aggregate already includes votes the live shards have seen since the
+    # switch, so the base shard holds only the difference
+    operations = [
+        UpdateOne(
+            {'category_id': ObjectId(category_id), 'nominee_id': ObjectId(nominee_id), 'shard': BASE_SHARD},
+            {'$set': {'count': counted.get(nominee_id, 0) - live.get(nominee_id, 0)}},
+            upsert=True
+        )
+        for nominee_id in set(counted) | set(live)
+    ]
+    if operations:
+        counters.bulk_write(operations, ordered=False)
+
+    categories.update_one({'id': category_id}, {'$set': {'tally': 'sharded'}})
+    return sum(counted.values())
+
+
+def main():
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Switch categories to sharded vote counters')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--category-id', action='append', help='Category to switch (repeatable)')
+    target.add_argument('--all', action='store_true', help='Switch every category')
+    parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS)
+    args = parser.parse_args()
+
+    # MongoDB connection
+    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'))
+    db = client['napling_choice_awards']
+    db['vote_counters'].create_index([('category_id', 1), ('nominee_id', 1), ('shard', 1)], unique=True)
+
+    query = {'deleted': {'$ne': True}}
+    if not args.all:
+        query['id'] = {'$in': args.category_id}
+    for category in db['categories'].find(query, {'id': 1, 'name': 1}):
+        votes = enable(db, category['id'], args.shards)
+        print(f"{category['name']}: {votes} votes counted over {args.shards} shards")
+
+
+if __name__ == '__main__':
+    main()
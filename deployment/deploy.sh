@@ -81,6 +81,9 @@ cd $PROJECT_DIR/frontend
 npm install
 npm run build
 
+# Pre-build .gz/.br variants served by nginx (gzip_static) or static_files.py
+../backend/venv/bin/python ../backend/static_files.py build
+
 # Set up nginx configuration
 echo "Configuring nginx..."
 sudo cp ../deployment/nginx.conf /etc/nginx/sites-available/napling-choice-awards
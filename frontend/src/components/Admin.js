@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { Container, Card, Form, Button, Table, Spinner, Alert, Modal, Badge } from 'react-bootstrap';
 import { useNavigate } from 'react-router-dom';
@@ -11,6 +11,8 @@ const Admin = () => {
   const [success, setSuccess] = useState('');
   const [expandedCategories, setExpandedCategories] = useState(new Set());
   const [currentUser, setCurrentUser] = useState(null);
+  // Highest change version applied locally, for /api/admin/changes
+  const versionRef = useRef(null);
 
   // Modal states
   const [showCategoryModal, setShowCategoryModal] = useState(false);
@@ -23,6 +25,8 @@ const Admin = () => {
   const [selectedCategoryId, setSelectedCategoryId] = useState(null);
   const [tempImageFile, setTempImageFile] = useState(null);
   const [tempImagePreview, setTempImagePreview] = useState('');
+  const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
 
   // Password change form
   const [passwordForm, setPasswordForm] = useState({
@@ -72,13 +76,11 @@ const Admin = () => {
 
   const fetchData = async () => {
     try {
-      const [categoriesRes, nomineesRes] = await Promise.all([
-        axios.get('/api/categories'),
-        axios.get('/api/nominees')
-      ]);
+      const response = await axios.get('/api/admin/changes');
 
-      setCategories(categoriesRes.data);
-      setNominees(nomineesRes.data);
+      versionRef.current = response.data.version;
+      setCategories(response.data.categories);
+      setNominees(response.data.nominees);
       setLoading(false);
     } catch (err) {
       setError('Failed to load data. Please try again later.');
@@ -86,6 +88,38 @@ const Admin = () => {
     }
   };
 
+  // Replace changed items by id and drop deleted ones
+  const applyChanges = (items, changed, deletedIds) => {
+    const deleted = new Set(deletedIds);
+    const byId = new Map(changed.map(item => [item.id, item]));
+    const updated = items
+      .filter(item => !deleted.has(item.id))
+      .map(item => {
+        const replacement = byId.get(item.id);
+        byId.delete(item.id);
+        return replacement || item;
+      });
+    return [...updated, ...[...byId.values()].filter(item => !deleted.has(item.id))];
+  };
+
+  // Fetch only what changed since the last load instead of the whole ballot
+  const syncChanges = async () => {
+    if (versionRef.current === null) {
+      return fetchData();
+    }
+    try {
+      const response = await axios.get('/api/admin/changes', { params: { since: versionRef.current } });
+      const { version, categories: changedCategories, nominees: changedNominees,
+              deleted_categories, deleted_nominees } = response.data;
+
+      versionRef.current = version;
+      setCategories(prev => applyChanges(prev, changedCategories, deleted_categories));
+      setNominees(prev => applyChanges(prev, changedNominees, deleted_nominees));
+    } catch (err) {
+      fetchData();
+    }
+  };
+
   const toggleCategoryExpansion = (categoryId) => {
     const newExpanded = new Set(expandedCategories);
     if (newExpanded.has(categoryId)) {
@@ -102,11 +136,22 @@ const Admin = () => {
 
     try {
       await axios.put(`/api/categories/${categoryId}`, {
-        ...category,
         voting_locked: !category.voting_locked
       });
       setSuccess(`Category ${category.voting_locked ? 'unlocked' : 'locked'} successfully!`);
-      fetchData();
+      syncChanges();
+      setTimeout(() => setSuccess(''), 3000);
+    } catch (err) {
+      setError('Failed to update category lock status.');
+      setTimeout(() => setError(''), 3000);
+    }
+  };
+
+  const setAllCategoriesLock = async (locked) => {
+    try {
+      const response = await axios.patch('/api/admin/categories', { all: true, voting_locked: locked });
+      setSuccess(`${response.data.modified} categories ${locked ? 'locked' : 'unlocked'} successfully!`);
+      syncChanges();
       setTimeout(() => setSuccess(''), 3000);
     } catch (err) {
       setError('Failed to update category lock status.');
@@ -145,7 +190,7 @@ const Admin = () => {
       setSuccess('Category updated successfully!');
       setEditingCategory(null);
       setShowCategoryModal(false);
-      fetchData();
+      syncChanges();
       setTimeout(() => setSuccess(''), 3000);
     } catch (err) {
       setError('Failed to update category. Please try again.');
@@ -175,7 +220,7 @@ const Admin = () => {
       setSuccess('Nominee updated successfully!');
       setShowNomineeModal(false);
       setEditingNominee(null);
-      fetchData();
+      syncChanges();
       setTimeout(() => setSuccess(''), 3000);
 
       // Clean up old image if a new one was uploaded and there was an old one
@@ -201,7 +246,7 @@ const Admin = () => {
         setSuccess('Category deleted successfully!');
         setShowCategoryModal(false);
         setEditingCategory(null);
-        fetchData();
+        syncChanges();
         setTimeout(() => setSuccess(''), 3000);
       } catch (err) {
         setError('Failed to delete category. Please try again.');
@@ -233,7 +278,7 @@ const Admin = () => {
         setSuccess('Nominee deleted successfully!');
         setShowNomineeModal(false);
         setEditingNominee(null);
-        fetchData();
+        syncChanges();
         setTimeout(() => setSuccess(''), 3000);
       } catch (err) {
         setError('Failed to delete nominee. Please try again.');
@@ -247,6 +292,24 @@ const Admin = () => {
     setShowCategoryModal(true);
   };
 
+  useEffect(() => {
+    // Search on the server once typing pauses
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get('/api/nominees/search', { params: { q: query, limit: 50 } });
+        setSearchResults(response.data);
+      } catch (err) {
+        setError('Search failed');
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
   const openNomineeModal = (nominee = null) => {
     setEditingNominee(nominee);
     setTempImageFile(null);
@@ -312,7 +375,7 @@ const Admin = () => {
       await axios.post('/api/categories', editingCategory);
       setSuccess('Category created successfully!');
       closeCategoryModal();
-      fetchData();
+      syncChanges();
       setTimeout(() => setSuccess(''), 3000);
     } catch (err) {
       setError('Failed to create category. Please try again.');
@@ -345,7 +408,7 @@ const Admin = () => {
       await axios.post('/api/nominees', nomineeData);
       setSuccess('Nominee created successfully!');
       closeNomineeModal();
-      fetchData();
+      syncChanges();
       setTimeout(() => setSuccess(''), 3000);
 
       // Clean up old image if a new one was uploaded and there was an old one
@@ -458,11 +521,62 @@ const Admin = () => {
         <Card>
           <Card.Header className="d-flex justify-content-between align-items-center">
             <h5 className="mb-0">Categories & Nominees</h5>
-            <Button variant="primary" onClick={openAddCategoryModal}>
-              Add Category
-            </Button>
+            <div>
+              <Button variant="outline-warning" className="me-2" onClick={() => setAllCategoriesLock(true)}>
+                Lock All
+              </Button>
+              <Button variant="outline-success" className="me-2" onClick={() => setAllCategoriesLock(false)}>
+                Unlock All
+              </Button>
+              <Button variant="primary" onClick={openAddCategoryModal}>
+                Add Category
+              </Button>
+            </div>
           </Card.Header>
           <Card.Body>
+            <Form.Control
+              type="search"
+              className="mb-3"
+              placeholder="Search nominees..."
+              value={searchQuery}
+              onChange={(e) => setSearchQuery(e.target.value)}
+            />
+            {searchResults && (
+              <div className="mb-4">
+                <h6 className="mb-3">
+                  {searchResults.total} match{searchResults.total !== 1 ? 'es' : ''}
+                  {searchResults.total > searchResults.results.length && ` (showing ${searchResults.results.length})`}
+                </h6>
+                <Table size="sm" striped bordered hover>
+                  <thead>
+                    <tr>
+                      <th>Name</th>
+                      <th>Category</th>
+                      <th>Description</th>
+                      <th>Actions</th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {searchResults.results.map((result) => (
+                      <tr key={result.id}>
+                        <td>{result.name}</td>
+                        <td>{categories.find(c => c.id === result.category_id)?.name || '-'}</td>
+                        <td>{result.description || '-'}</td>
+                        <td>
+                          <Button
+                            variant="primary"
+                            size="sm"
+                            onClick={() => openNomineeModal(nominees.find(n => n.id === result.id) || result)}
+                          >
+                            Edit
+                          </Button>
+                        </td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </Table>
+              </div>
+            )}
             {categories.length > 0 ? (
               <Table striped bordered hover>
                 <thead>
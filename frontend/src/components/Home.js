@@ -26,25 +26,20 @@ const Home = () => {
 
   const fetchData = async () => {
     try {
-      const [categoriesRes, nomineesRes] = await Promise.all([
-        axios.get('/api/categories'),
-        axios.get('/api/nominees')
-      ]);
+      // Categories arrive with their nominees already grouped
+      const ballotRes = await axios.get('/api/ballot');
+      const ballotCategories = ballotRes.data.categories;
 
-      setCategories(categoriesRes.data);
+      setCategories(ballotCategories);
 
-      // Group nominees by category
       const groupedNominees = {};
-      nomineesRes.data.forEach(nominee => {
-        if (!groupedNominees[nominee.category_id]) {
-          groupedNominees[nominee.category_id] = [];
-        }
-        groupedNominees[nominee.category_id].push(nominee);
+      ballotCategories.forEach(category => {
+        groupedNominees[category.id] = category.nominees;
       });
       setNominees(groupedNominees);
 
       // Fetch user votes for each category
-      const votePromises = categoriesRes.data.map(category =>
+      const votePromises = ballotCategories.map(category =>
         axios.get(`/api/vote/${category.id}`).catch((err) => {
           console.log(`Failed to fetch vote for category ${category.id}:`, err);
           return { data: { vote: null } };
@@ -55,7 +50,7 @@ const Home = () => {
       const votes = {};
 
       voteResponses.forEach((response, index) => {
-        const categoryId = categoriesRes.data[index].id;
+        const categoryId = ballotCategories[index].id;
         console.log(`Category ${categoryId} vote response:`, response.data);
 
         // Handle both response formats: {vote: voteData} or direct voteData
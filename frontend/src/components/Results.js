@@ -33,6 +33,18 @@ const Results = () => {
 
     for (const category of categories) {
       try {
+        if (category.published?.results_url) {
+          // Published results are static files on S3/CDN; plain fetch avoids sending auth headers
+          try {
+            const response = await fetch(category.published.results_url);
+            if (response.ok) {
+              resultsData[category.id] = await response.json();
+              continue;
+            }
+          } catch (err) {
+            console.error(`Falling back to the API for ${category.name}:`, err);
+          }
+        }
         const response = await axios.get(`/api/results/${category.id}`);
         resultsData[category.id] = response.data;
       } catch (err) {